@@ -212,7 +212,7 @@ print(f"[Solveig] Inloggad som: {st.session_state.get('username')}")
 # --- TUNGA IMPORTER (Händer bara efter inlogg) ---
 import torch
 from langchain_chroma import Chroma
-from langchain_huggingface import HuggingFaceEmbeddings
+from src.utils.embedding_backends import load_embeddings
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
@@ -224,6 +224,9 @@ load_dotenv()
 # Detektera om vi kör lokalt eller i molnet
 IS_CLOUD = os.environ.get("STREAMLIT_RUNTIME_ENV") == "cloud" or "SPACE_ID" in os.environ
 
+# "torch" (standard) eller "onnx" (int8-kvantiserad BGE-M3 via ONNX Runtime, snabbare på ren CPU)
+EMBEDDING_BACKEND = os.environ.get("EMBEDDING_BACKEND", "torch")
+
 if IS_CLOUD:
     # Molnkonfiguration - använd relativa paths (för Streamlit Cloud)
     BASE_DIR = Path(".")
@@ -421,9 +424,10 @@ def load_resources():
         device = "cpu"
         
     # Använd BGE-M3
-    embedding_model = HuggingFaceEmbeddings(
+    embedding_model = load_embeddings(
+        EMBEDDING_BACKEND,
         model_name="BAAI/bge-m3",
-        model_kwargs={'device': device},
+        device=device,
         encode_kwargs={'normalize_embeddings': False}
     )
    
@@ -0,0 +1,103 @@
+"""
+bench_embedding_batching.py – Jämför batchningsstrategier för embedding på CPU
+
+Tar ett slumpmässigt urval av chunks ur den extraherade texten (samma
+uppdelning som steg 04), embeddar dem med varje strategi i
+src/utils/embedding_batching.py och rapporterar genomströmning (chunks/s)
+samt att vektorerna blir desamma oavsett strategi.
+
+Användning:
+    uv run python benchmarks/bench_embedding_batching.py                # 512 chunks
+    uv run python benchmarks/bench_embedding_batching.py --sample 2048 --threads 8
+"""
+
+import sys
+import time
+import random
+import argparse
+from pathlib import Path
+
+import numpy as np
+import torch
+from langchain_huggingface import HuggingFaceEmbeddings
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from transformers import AutoTokenizer
+
+# Lägg till projektets rot i sys.path
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(PROJECT_ROOT))
+
+from src.utils.paths import EXTRACTED_TEXT_DIR, TEXT_STORE_FILE
+from src.utils.text_store import iter_extracted_documents
+from src.utils.embedding_batching import BATCHING_STRATEGIES, embed_in_batches, token_counter
+
+
+def sample_chunks(sample: int, seed: int) -> list[str]:
+    """Slumpmässigt urval (reservoarurval) av chunks ur hela korpusen."""
+    text_splitter = RecursiveCharacterTextSplitter(chunk_size=2000, chunk_overlap=400,
+                                                   separators=['\n\n', '\n', ' ', ''])
+    rng = random.Random(seed)
+    chunks = []
+    seen = 0
+    for data in iter_extracted_documents(EXTRACTED_TEXT_DIR, TEXT_STORE_FILE, on_error=lambda *_: None):
+        for page in data.get('pages', []):
+            if not page.get('text', '').strip():
+                continue
+            for chunk in text_splitter.split_text(page['text']):
+                seen += 1
+                if len(chunks) < sample:
+                    chunks.append(chunk)
+                elif (j := rng.randrange(seen)) < sample:
+                    chunks[j] = chunk
+    return chunks
+
+
+def run_benchmark(texts: list[str], model_name: str, max_tokens: int):
+    model = HuggingFaceEmbeddings(
+        model_name=model_name,
+        model_kwargs={'device': 'cpu'},
+        encode_kwargs={'normalize_embeddings': False, 'batch_size': 256},
+    )
+    count_tokens = token_counter(AutoTokenizer.from_pretrained(model_name))
+    lengths = count_tokens(texts)
+    print(f"Tokens per chunk: medel {np.mean(lengths):.0f}, median {np.median(lengths):.0f}, max {max(lengths)}")
+
+    # Uppvärmning så att första strategin inte får betala för laddningen
+    model.embed_documents(texts[:8])
+
+    results = {}
+    for strategy in BATCHING_STRATEGIES:
+        start = time.perf_counter()
+        results[strategy] = embed_in_batches(model.embed_documents, texts, strategy, count_tokens=count_tokens,
+                                             batch_size=32, max_tokens=max_tokens)
+        elapsed = time.perf_counter() - start
+        print(f"{strategy:<8} {len(texts):>6} chunks  {elapsed:>8.1f} s  {len(texts) / elapsed:>8.1f} chunks/s")
+
+    fixed, length = np.asarray(results["fixed"]), np.asarray(results["length"])
+    cosine = (fixed * length).sum(axis=1) / (np.linalg.norm(fixed, axis=1) * np.linalg.norm(length, axis=1))
+    print(f"Minsta cosinuslikhet mellan strategierna: {cosine.min():.5f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Jämför batchningsstrategier för embedding på CPU.")
+    parser.add_argument("--sample", type=int, default=512, help="Antal chunks i urvalet")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--model", default="BAAI/bge-m3")
+    parser.add_argument("--max-tokens", type=int, default=16384, help="Tokenbudget per batch för 'length'")
+    parser.add_argument("--threads", type=int, default=None, help="Antal torch-trådar (standard: torch väljer)")
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    texts = sample_chunks(args.sample, args.seed)
+    if not texts:
+        print("Ingen extraherad text hittades. Kör steg 03 först.")
+        return
+    print(f"Jämför {', '.join(BATCHING_STRATEGIES)} på {len(texts)} chunks med {args.model} (CPU, "
+          f"{torch.get_num_threads()} trådar)...")
+    run_benchmark(texts, args.model, args.max_tokens)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+bench_onnx_embeddings.py – Jämför PyTorch- och ONNX-backend (int8) för BGE-M3 på CPU
+
+Mäter latens för embed_query (som varje chattfråga betalar), genomströmning
+för embed_documents på ett urval av chunks samt likheten (cosinus) mellan
+backendarnas vektorer. Exporterar ONNX-modellen först om den saknas.
+
+Användning:
+    uv run python benchmarks/bench_onnx_embeddings.py               # 256 chunks, 50 frågor
+    uv run python benchmarks/bench_onnx_embeddings.py --sample 1024 --threads 8
+"""
+
+import sys
+import time
+import argparse
+from pathlib import Path
+
+import numpy as np
+import torch
+
+# Lägg till projektets rot i sys.path
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(PROJECT_ROOT))
+
+from src.utils.embedding_backends import EMBEDDING_BACKENDS, load_embeddings
+from bench_embedding_batching import sample_chunks
+
+QUERIES = [
+    "Vilka vindkraftsprojekt har fått avslag i Skåne?",
+    "Hur långt är skyddsavståndet till närmaste bostad?",
+    "Vilka ljudvillkor gäller för verksamheten nattetid?",
+    "Har Försvarsmakten haft invändningar mot parken?",
+    "Vad säger kommunen om solcellsparkens påverkan på jordbruksmark?",
+]
+
+
+def run_benchmark(texts: list[str], queries: int, threads: int | None):
+    vectors = {}
+    for backend in EMBEDDING_BACKENDS:
+        model = load_embeddings(backend, device="cpu", num_threads=threads)
+        model.embed_query(QUERIES[0])  # Uppvärmning
+
+        latencies = []
+        for i in range(queries):
+            start = time.perf_counter()
+            model.embed_query(QUERIES[i % len(QUERIES)])
+            latencies.append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        vectors[backend] = np.asarray(model.embed_documents(texts))
+        elapsed = time.perf_counter() - start
+
+        latencies.sort()
+        print(f"{backend:<6} embed_query: median {latencies[len(latencies) // 2]:>7.1f} ms, "
+              f"p95 {latencies[int(len(latencies) * 0.95)]:>7.1f} ms  |  "
+              f"embed_documents: {len(texts) / elapsed:>6.1f} chunks/s")
+        del model
+
+    a, b = vectors["torch"], vectors["onnx"]
+    cosine = (a * b).sum(axis=1) / (np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1))
+    print(f"Cosinuslikhet torch vs. onnx: medel {cosine.mean():.4f}, minsta {cosine.min():.4f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Jämför PyTorch- och ONNX-backend för BGE-M3 på CPU.")
+    parser.add_argument("--sample", type=int, default=256, help="Antal chunks för embed_documents")
+    parser.add_argument("--queries", type=int, default=50, help="Antal embed_query-anrop att mäta")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--threads", type=int, default=None, help="Antal trådar per backend")
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    texts = sample_chunks(args.sample, args.seed)
+    if not texts:
+        print("Ingen extraherad text hittades. Kör steg 03 först.")
+        return
+    print(f"Jämför {', '.join(EMBEDDING_BACKENDS)} på {len(texts)} chunks och {args.queries} frågor (CPU)...")
+    run_benchmark(texts, args.queries, args.threads)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+bench_pdf_engines.py – Jämför PDF-motorerna (pdfium vs. pdfplumber)
+
+Tar ett slumpmässigt urval av PDF:er ur rådatamappen, extraherar texten
+med båda motorerna och rapporterar genomströmning (sidor/s) samt hur lika
+texterna är (andel gemensamma ord per sida).
+
+Användning:
+    uv run python benchmarks/bench_pdf_engines.py              # 50 filer
+    uv run python benchmarks/bench_pdf_engines.py --sample 200
+"""
+
+import sys
+import time
+import random
+import argparse
+from collections import Counter
+from pathlib import Path
+
+# Lägg till projektets rot i sys.path
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(PROJECT_ROOT))
+
+from src.utils.paths import RAW_DATA_DIR
+from src.utils.pdf_text import PDF_ENGINES, extract_page_texts
+
+
+def word_parity(a: str, b: str) -> float:
+    """Andel gemensamma ord (multimängd) mellan två texter, 1.0 = identiska ord."""
+    words_a, words_b = Counter(a.split()), Counter(b.split())
+    total = max(sum(words_a.values()), sum(words_b.values()))
+    if total == 0:
+        return 1.0
+    return sum((words_a & words_b).values()) / total
+
+
+def run_benchmark(files: list[Path]):
+    timings = {engine: 0.0 for engine in PDF_ENGINES}
+    pages = {engine: 0 for engine in PDF_ENGINES}
+    parities = []
+    failed = 0
+
+    for file_path in files:
+        try:
+            texts = {}
+            for engine in PDF_ENGINES:
+                start = time.perf_counter()
+                texts[engine] = extract_page_texts(file_path, engine)
+                timings[engine] += time.perf_counter() - start
+                pages[engine] += len(texts[engine])
+        except Exception as e:
+            print(f"  Hoppar över {file_path.name}: {type(e).__name__}")
+            failed += 1
+            continue
+
+        reference = texts["pdfplumber"]
+        for page_number, text in texts["pdfium"].items():
+            parities.append(word_parity(text, reference.get(page_number, "")))
+
+    print("\n--- Resultat ---")
+    print(f"Filer: {len(files) - failed} ({failed} kunde inte läsas)")
+    for engine in PDF_ENGINES:
+        rate = pages[engine] / timings[engine] if timings[engine] else 0.0
+        print(f"{engine:<12} {pages[engine]:>6} sidor  {timings[engine]:>8.1f} s  {rate:>8.1f} sidor/s")
+    if timings["pdfium"]:
+        print(f"Uppsnabbning pdfium vs. pdfplumber: {timings['pdfplumber'] / timings['pdfium']:.1f}x")
+    if parities:
+        parities.sort()
+        print(f"Textlikhet per sida: medel {sum(parities) / len(parities):.3f}, "
+              f"median {parities[len(parities) // 2]:.3f}, "
+              f"andel sidor >= 0.95: {sum(p >= 0.95 for p in parities) / len(parities):.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Jämför PDF-motorer på ett urval av korpusen.")
+    parser.add_argument("--sample", type=int, default=50, help="Antal PDF:er i urvalet")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--dir", type=Path, default=RAW_DATA_DIR, help="Mapp att hämta PDF:er från")
+    args = parser.parse_args()
+
+    all_pdfs = sorted(args.dir.rglob("*.pdf"))
+    if not all_pdfs:
+        print(f"Inga PDF-filer hittades i {args.dir}.")
+        return
+
+    random.seed(args.seed)
+    files = random.sample(all_pdfs, min(args.sample, len(all_pdfs)))
+    print(f"Jämför {', '.join(PDF_ENGINES)} på {len(files)} av {len(all_pdfs)} PDF:er...")
+    run_benchmark(files)
+
+
+if __name__ == "__main__":
+    main()
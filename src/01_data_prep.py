@@ -2,24 +2,25 @@
 01_data_prep.py – Dataförberedelse
 
 Konverterat från notebooks/01_data_prep.ipynb.
-Hanterar:
+Rådatamappen gås igenom en gång (os.scandir) och alla steg delar samma
+inventering. Hanterar:
   1. Filinventering (räknar filtyper)
-  2. ZIP-uppackning
-  3. Dubblettborttagning (SHA256)
+  2. ZIP-uppackning (parallell, även nästlade arkiv)
+  3. Dubblettborttagning (storlek -> snabbhash -> SHA256)
   4. Borttagning av tomma mappar
   5. Flytt av filer som ej stöds (bilder, CAD, film, etc.)
 """
 
 import os
-import zipfile
-import hashlib
 import shutil
 from pathlib import Path
-from collections import Counter
-from tqdm import tqdm
 
 # Importera centrala sökvägar
-from utils.paths import RAW_DATA_DIR, UNSUPPORTED_DIR, ensure_directories
+from utils.paths import RAW_DATA_DIR, UNSUPPORTED_DIR, FILE_MANIFEST_FILE, ensure_directories
+from utils.dedup import find_duplicates
+from utils.file_manifest import FileManifest
+from utils.file_scan import TreeInventory, scan_tree
+from utils.zip_extract import extract_all_archives
 
 # ============================================================
 # KONFIGURATION
@@ -40,16 +41,10 @@ UNSUPPORTED_EXTENSIONS = ['.jpg', '.heic', '.dwg', '.mov']
 # HJÄLPFUNKTIONER
 # ============================================================
 
-def run_file_inventory(directory: Path):
-    """Söker igenom och räknar filtyper i en mapp."""
-    print(f"\n--- Startar inventering av: {directory} ---")
-    file_extensions = []
-    for file_path in directory.rglob('*'):
-        if file_path.is_file():
-            extension = file_path.suffix.lower()
-            file_extensions.append(extension if extension else "<ingen filändelse>")
-
-    file_counts = Counter(file_extensions)
+def run_file_inventory(inventory: TreeInventory):
+    """Räknar filtyper i en inventerad mapp."""
+    print(f"\n--- Startar inventering av: {inventory.root} ---")
+    file_counts = inventory.extension_counts
     total_files = 0
 
     if not file_counts:
@@ -65,65 +60,54 @@ def run_file_inventory(directory: Path):
     return total_files
 
 
-def get_file_hash(file_path: Path) -> str:
-    """Beräknar SHA256-hashen för en fil."""
-    sha256 = hashlib.sha256()
-    try:
-        with open(file_path, 'rb') as f:
-            while chunk := f.read(8192):
-                sha256.update(chunk)
-        return sha256.hexdigest()
-    except IOError:
-        return ""  # Vid läsfel
-
-
-def unzip_files(target_dir: Path):
-    """Packar upp alla ZIP-filer och raderar originalen."""
-    zip_files = list(target_dir.rglob('*.zip'))
+def unzip_files(zip_files: list[Path]):
+    """
+    Packar upp alla ZIP-filer (även ZIP-filer inuti arkiven) och raderar originalen.
+    Arkiven packas upp parallellt, ett per processorkärna.
+    """
     print(f"\nHittade {len(zip_files)} ZIP-filer att bearbeta.")
 
-    for zip_file_path in zip_files:
-        print(f"\nBearbetar: {zip_file_path.name}...")
-        extract_folder = zip_file_path.parent
-
-        try:
-            with zipfile.ZipFile(zip_file_path, 'r') as zip_ref:
-                zip_ref.extractall(extract_folder)
-            print(f"  -> Uppackad till: {extract_folder}")
-            os.remove(zip_file_path)
-            print(f"  -> Original .zip-fil raderad.")
-        except zipfile.BadZipFile:
-            print(f"  -> FEL: Kunde inte öppna {zip_file_path.name}. Filen kan vara korrupt.")
-        except Exception as e:
-            print(f"  -> FEL: Ett okänt fel uppstod: {e}")
+    results = extract_all_archives(zip_files)
 
-    print("\nZIP-bearbetning klar.")
+    failed = sum(1 for r in results if r["status"] != "success")
+    print(f"\nZIP-bearbetning klar. {len(results)} arkiv bearbetade", end="")
+    print(f" ({failed} misslyckades)." if failed else ".")
 
 
-def remove_duplicates(target_dir: Path, all_files: list) -> int:
-    """Hittar och raderar dubblettfiler baserat på SHA256-hash."""
-    seen_hashes = {}
-    duplicate_count = 0
+def remove_duplicates(inventory: TreeInventory) -> int:
+    """
+    Hittar och raderar dubblettfiler baserat på SHA256-hash.
 
-    candidates = [f for f in all_files if f.is_file() and f.suffix.lower() != '.zip']
-    print(f"\nDubblettkontroll på {len(candidates)} filer (kan ta flera minuter)...")
+    Filerna grupperas först på storlek och snabbhash, så att full SHA256
+    bara beräknas för filer som faktiskt kan vara dubbletter. Hashar sparas
+    i filmanifestet och återanvänds så länge storlek och mtime är oförändrade.
+    """
+    entries = [e for e in inventory.files if e.extension != '.zip']
+    candidates = [e.path for e in entries]
+    stats = {e.path: (e.size, e.mtime_ns) for e in entries}
+    print(f"\nDubblettkontroll på {len(candidates)} filer...")
 
-    for file_path in tqdm(candidates, desc="Kontrollerar dubbletter", unit="fil"):
-        file_hash = get_file_hash(file_path)
-        if not file_hash:
-            continue
+    with FileManifest(FILE_MANIFEST_FILE, inventory.root) as manifest:
+        print(f"Filmanifest: {len(manifest)} filer med sparade hashar.")
+        duplicates, unreadable = find_duplicates(candidates, manifest=manifest, stats=stats)
 
-        if file_hash in seen_hashes:
+        duplicate_count = 0
+        removed = []
+        for file_path in duplicates:
             duplicate_count += 1
             try:
                 os.remove(file_path)
+                removed.append(file_path)
+                inventory.discard(file_path)
             except Exception as e:
                 print(f"  -> FEL: Kunde inte radera: {file_path.name}: {e}")
-        else:
-            seen_hashes[file_hash] = file_path
+
+        manifest.remove(removed)
+        manifest.prune(candidates)
 
     print(f"\n--- Dubblettkontroll klar! ---")
-    print(f"Unika filer behållna: {len(seen_hashes)} | Dubbletter raderade: {duplicate_count}")
+    unique_count = len(candidates) - duplicate_count - unreadable
+    print(f"Unika filer behållna: {unique_count} | Dubbletter raderade: {duplicate_count}")
     return duplicate_count
 
 
@@ -136,34 +120,35 @@ def is_protected_folder(folder_name: str, core_names: list[str]) -> bool:
     return False
 
 
-def remove_empty_folders(target_dir: Path):
+def remove_empty_folders(inventory: TreeInventory):
     """Raderar tomma mappar, men hoppar över skyddade landskapsmappar."""
     removed_count = 0
     print("\nStartar rensning av tomma mappar...")
 
-    for folder_path in sorted(target_dir.rglob('*'), reverse=True):
-        if folder_path.is_dir():
-            if is_protected_folder(folder_path.name, CORE_LANDSCAPE_NAMES):
-                continue
-            try:
-                if not any(folder_path.iterdir()):
-                    os.rmdir(folder_path)
-                    removed_count += 1
-            except OSError:
-                pass
+    # Omvänd sortering ger undermappar före föräldrar, så att mappar
+    # som blir tomma när deras undermappar tas bort också rensas.
+    for folder_path in sorted(inventory.dirs, reverse=True):
+        if inventory.is_removed(folder_path) or inventory.child_counts.get(folder_path) != 0:
+            continue
+        if is_protected_folder(folder_path.name, CORE_LANDSCAPE_NAMES):
+            continue
+        try:
+            os.rmdir(folder_path)
+            inventory.discard(folder_path)
+            removed_count += 1
+        except OSError:
+            pass
 
     print(f"Totalt antal tomma mappar rensade: {removed_count}")
 
 
-def move_unsupported_files(target_dir: Path, unsupported_dir: Path):
+def move_unsupported_files(inventory: TreeInventory, unsupported_dir: Path):
     """Flyttar filer med filtyper som ej stöds till en separat mapp."""
     unsupported_dir.mkdir(parents=True, exist_ok=True)
     print(f"\nMapp för filer som inte stöds: {unsupported_dir}")
-    print(f"Genomsöker {target_dir} efter filer att flytta...")
+    print(f"Letar i {inventory.root} efter filer att flytta...")
 
-    files_to_move = []
-    for ext in UNSUPPORTED_EXTENSIONS:
-        files_to_move.extend(target_dir.rglob(f'*{ext}'))
+    files_to_move = [e.path for e in inventory.with_extensions(UNSUPPORTED_EXTENSIONS)]
 
     if not files_to_move:
         print("Hittade inga filer med ej stödda filändelser.")
@@ -185,6 +170,7 @@ def move_unsupported_files(target_dir: Path, unsupported_dir: Path):
                 counter += 1
 
             shutil.move(file_path, destination_path)
+            inventory.discard(file_path)
             moved_count += 1
         except Exception as e:
             print(f"  -> FEL: Kunde inte flytta {file_path.name}. Fel: {e}")
@@ -214,33 +200,33 @@ def main():
 
     # 1. Filinventering FÖRE + räkna filer
     print("\nRäknar filer...", end="", flush=True)
-    all_raw_files = list(RAW_DATA_DIR.rglob('*'))
-    num_files = sum(1 for f in all_raw_files if f.is_file())
-    num_zips  = sum(1 for f in all_raw_files if f.suffix.lower() == '.zip' and f.is_file())
+    inventory = scan_tree(RAW_DATA_DIR)
+    num_files = len(inventory.files)
+    num_zips = len(inventory.zips)
     print(f" {num_files} filer totalt ({num_zips} ZIP-filer)")
 
     # 2. Packa upp ZIP-filer
     if num_zips > 0:
         print("\n📦 Packar upp ZIP-filer...")
-        unzip_files(RAW_DATA_DIR)
-        # Uppdatera fillistan efter uppackning
-        all_raw_files = list(RAW_DATA_DIR.rglob('*'))
+        unzip_files([e.path for e in inventory.zips])
+        # Uppackningen ändrar mappstrukturen, så inventera om en gång
+        inventory = scan_tree(RAW_DATA_DIR)
     else:
         print("\nInga ZIP-filer att packa upp.")
 
     # 3. Ta bort dubbletter
     print()
-    remove_duplicates(RAW_DATA_DIR, all_raw_files)
+    remove_duplicates(inventory)
 
     # 4. Rensa tomma mappar
-    remove_empty_folders(RAW_DATA_DIR)
+    remove_empty_folders(inventory)
 
     # 5. Flytta filer som ej stöds
-    move_unsupported_files(RAW_DATA_DIR, UNSUPPORTED_DIR)
+    move_unsupported_files(inventory, UNSUPPORTED_DIR)
 
     # 6. Filinventering EFTER
     print("\n📋 Inventering EFTER städning:")
-    run_file_inventory(RAW_DATA_DIR)
+    run_file_inventory(inventory)
 
     print("\n✅ Dataförberedelse klar!")
 
@@ -2,19 +2,46 @@
 02_pdf_ocr_analysis.py – PDF-analys (Text vs. OCR)
 
 Konverterat från notebooks/02_pdf_ocr_analysis.ipynb.
-Analyserar varje PDF-fil för att avgöra om den är textbaserad
-eller om den kräver OCR (skannad bild).
+Analyserar varje sida i varje PDF-fil för att avgöra om den är
+textbaserad eller om den kräver OCR (skannad bild).
 Sparar resultaten i en CSV-rapport.
 Stödjer inkrementella uppdateringar – analyserar bara NYA filer.
+
+Analysen körs parallellt på alla processorkärnor. Resultaten skrivs till
+rapporten löpande, så en avbruten körning behåller det som redan analyserats.
 """
 
 import pandas as pd
-import pdfplumber
 from pathlib import Path
 from tqdm import tqdm
+from multiprocessing import cpu_count
 
 # Importera centrala sökvägar
 from utils.paths import RAW_DATA_DIR, PROCESSED_DIR, ANALYSIS_REPORT_FILE, ensure_directories
+from utils.parallel import TaskTimeout, recycling_map
+from utils.pdf_text import DEFAULT_PDF_ENGINE, extract_page_texts, format_page_ranges, needs_ocr
+
+# ============================================================
+# KONFIGURATION
+# ============================================================
+REPORT_COLUMNS = [
+    "full_path", "status", "chars_page_1", "total_pages", "filename", "ocr_pages",
+    "source_size", "source_mtime_ns",
+]
+# Heltal med saknade värden – mtime i ns får inte plats exakt i en float
+FINGERPRINT_DTYPES = {"source_size": "Int64", "source_mtime_ns": "Int64"}
+
+# Motor för textextrahering: "pdfium" (snabb) eller "pdfplumber"
+PDF_ENGINE = DEFAULT_PDF_ENGINE
+
+# Max antal sekunder per PDF innan workern dödas och filen markeras som error_timeout
+ANALYSIS_TIMEOUT_SECONDS = 60
+
+# Antal analyserade filer som samlas innan de skrivs till rapporten
+REPORT_FLUSH_EVERY = 200
+
+# Status för filer där workern föll i stället för analysen; de analyseras om nästa körning
+WORKER_ERROR_PREFIX = "error_worker_"
 
 
 # ============================================================
@@ -23,29 +50,65 @@ from utils.paths import RAW_DATA_DIR, PROCESSED_DIR, ANALYSIS_REPORT_FILE, ensur
 
 def analyze_pdf_type(file_path: Path) -> dict:
     """
-    Analyserar en enskild PDF och returnerar dess typ.
-
-    Heuristik:
-      - > 50 tecken på sida 1 => text_based
-      - <= 50 tecken på sida 1 => ocr_candidate
+    Analyserar en enskild PDF sida för sida och returnerar dess typ.
+
+    Heuristik per sida: > 50 tecken => textsida, annars OCR-sida.
+      - inga OCR-sidor         => text_based
+      - bara OCR-sidor         => ocr_candidate
+      - både text- och OCR-sidor => mixed
+    Sidorna som behöver OCR sparas som intervall i "ocr_pages" (t.ex. "2-5,9").
+    Texten hämtas som i steg 03 (med pdfplumber som reserv), så att en sida
+    med ett textlager som bara pdfplumber kan läsa inte skickas till OCR.
     """
     try:
-        with pdfplumber.open(file_path) as pdf:
-            if not pdf.pages:
-                return {"status": "error_no_pages", "chars_page_1": 0, "total_pages": 0}
+        texts = extract_page_texts(file_path, PDF_ENGINE)
+        total_pages = len(texts)
+        if total_pages == 0:
+            return {"status": "error_no_pages", "chars_page_1": 0, "total_pages": 0, "ocr_pages": ""}
+
+        char_count = len(texts[1].strip())
+        ocr_pages = [n for n, text in texts.items() if needs_ocr(text)]
+
+        if not ocr_pages:
+            status = "text_based"
+        elif len(ocr_pages) == total_pages:
+            status = "ocr_candidate"
+        else:
+            status = "mixed"
+        return {
+            "status": status, "chars_page_1": char_count, "total_pages": total_pages,
+            "ocr_pages": format_page_ranges(ocr_pages),
+        }
+
+    except Exception as e:
+        return {"status": f"error_{type(e).__name__}", "chars_page_1": 0, "total_pages": 0, "ocr_pages": ""}
 
-            first_page = pdf.pages[0]
-            text = first_page.extract_text()
-            char_count = len(text.strip()) if text else 0
-            total_pages = len(pdf.pages)
 
-            if char_count > 50:
-                return {"status": "text_based", "chars_page_1": char_count, "total_pages": total_pages}
-            else:
-                return {"status": "ocr_candidate", "chars_page_1": char_count, "total_pages": total_pages}
+def analyze_pdf_task(file_path: Path) -> dict:
+    """Worker-funktion: analyserar en PDF och lägger till sökvägsinfo."""
+    result = analyze_pdf_type(file_path)
+    result["full_path"] = str(file_path)
+    result["filename"] = file_path.name
+    result["source_size"], result["source_mtime_ns"] = file_stat(file_path)
+    return result
 
-    except Exception as e:
-        return {"status": f"error_{type(e).__name__}", "chars_page_1": 0, "total_pages": 0}
+
+def file_stat(file_path: Path) -> tuple[int | None, int | None]:
+    """(storlek, mtime_ns) – används för att upptäcka filer som ersatts på plats."""
+    try:
+        st = file_path.stat()
+        return st.st_size, st.st_mtime_ns
+    except OSError:
+        return None, None
+
+
+def append_to_report(rows: list, report_file: Path):
+    """Lägger till analyserade rader sist i rapporten."""
+    if rows:
+        # Utan object + Int64 blir hela kolumnen float om en rad saknar fingeravtryck
+        pd.DataFrame(rows, columns=REPORT_COLUMNS, dtype=object).astype(FINGERPRINT_DTYPES).to_csv(
+            report_file, mode='a', header=False, index=False, encoding='utf-8'
+        )
 
 
 # ============================================================
@@ -61,12 +124,12 @@ def main():
 
     # 1. Ladda befintlig rapport (om den finns)
     try:
-        df_existing = pd.read_csv(ANALYSIS_REPORT_FILE)
+        df_existing = pd.read_csv(ANALYSIS_REPORT_FILE, dtype=FINGERPRINT_DTYPES)
         seen_files = set(df_existing['full_path'].apply(lambda x: str(Path(x))))
         print(f"Hittade en befintlig rapport med {len(seen_files)} analyserade filer.")
     except FileNotFoundError:
         print("Ingen befintlig rapport hittades. Startar en ny analys.")
-        df_existing = pd.DataFrame(columns=["full_path", "status", "chars_page_1", "total_pages", "filename"])
+        df_existing = pd.DataFrame(columns=REPORT_COLUMNS)
         seen_files = set()
 
     # 2. Hitta ALLA PDF-filer på disk
@@ -74,7 +137,39 @@ def main():
     all_pdf_files = list(RAW_DATA_DIR.rglob("*.pdf"))
     print(f"Hittade totalt {len(all_pdf_files)} PDF-filer på disken.")
 
-    # 3. Filtrera ut NYA filer
+    # 3. Upptäck filer som ersatts på plats (samma sökväg, ny storlek eller mtime)
+    current_stats = {str(p): file_stat(p) for p in all_pdf_files}
+    df_existing = df_existing.reindex(columns=REPORT_COLUMNS).astype(FINGERPRINT_DTYPES)
+    df_existing['full_path'] = df_existing['full_path'].apply(lambda x: str(Path(x)))
+
+    def is_changed(path, size, mtime_ns) -> bool:
+        if pd.isna(size) or path not in current_stats:
+            return False
+        return current_stats[path] != (int(size), int(mtime_ns))
+
+    changed = pd.Series(
+        [is_changed(*r) for r in zip(df_existing['full_path'], df_existing['source_size'], df_existing['source_mtime_ns'])],
+        index=df_existing.index, dtype=bool,
+    )
+    changed_count = int(changed.sum())
+
+    # Rader där själva workern föll (t.ex. BrokenProcessPool) säger inget om filen
+    # och analyseras om. Det gäller även äldre felrader utan fingeravtryck.
+    status = df_existing['status'].astype(str)
+    retried = status.str.startswith(WORKER_ERROR_PREFIX) | (
+        status.str.startswith("error_") & df_existing['source_size'].isna()
+    )
+    retried_count = int((retried & ~changed).sum())
+    df_existing = df_existing[~changed & ~retried]
+    seen_files = set(df_existing['full_path'])
+
+    # Äldre rader utan fingeravtryck får filens nuvarande storlek och mtime
+    for idx in df_existing.index[df_existing['source_size'].isna()]:
+        size, mtime_ns = current_stats.get(df_existing.at[idx, 'full_path'], (None, None))
+        df_existing.at[idx, 'source_size'] = size
+        df_existing.at[idx, 'source_mtime_ns'] = mtime_ns
+
+    # 4. Filtrera ut NYA (och ändrade) filer
     files_to_analyze = [
         f for f in all_pdf_files
         if str(f) not in seen_files
@@ -83,39 +178,65 @@ def main():
     print(f"\n--- Analys-sammanfattning ---")
     print(f"Totalt antal filer på disk: {len(all_pdf_files)}")
     print(f"Filer redan analyserade:   {len(seen_files)}")
+    print(f"Ändrade filer (analyseras om): {changed_count}")
+    print(f"Worker-fel (analyseras om): {retried_count}")
     print(f"NYA filer att analysera:    {len(files_to_analyze)}")
 
-    # 4. Rensa bort borttagna filer från rapporten
-    existing_paths_on_disk = set(str(p) for p in all_pdf_files)
+    # 5. Rensa bort borttagna filer från rapporten
+    existing_paths_on_disk = set(current_stats)
     original_count = len(df_existing)
-    df_existing = df_existing[df_existing['full_path'].apply(lambda x: str(Path(x)) in existing_paths_on_disk)]
+    df_existing = df_existing[df_existing['full_path'].isin(existing_paths_on_disk)]
     removed_count = original_count - len(df_existing)
     if removed_count > 0:
         print(f"Rensade bort {removed_count} borttagna filer från rapporten.")
 
-    # 5. Analysera NYA filer
-    new_analysis_results = []
+    # Skriv om rapporten med de befintliga raderna, nya rader läggs till löpande
+    df_existing.to_csv(ANALYSIS_REPORT_FILE, index=False, encoding='utf-8-sig')
 
+    # 6. Analysera NYA filer parallellt
     if files_to_analyze:
-        print(f"\nStartar analys av {len(files_to_analyze)} nya filer...")
-        for file in tqdm(files_to_analyze, desc="Analyserar NYA PDF-filer"):
-            result = analyze_pdf_type(file)
-            result["full_path"] = str(file)
-            result["filename"] = file.name
-            new_analysis_results.append(result)
+        num_workers = cpu_count()
+        print(f"\nStartar analys av {len(files_to_analyze)} nya filer på {num_workers} kärnor...")
+        pending_rows = []
+        # En PDF som hänger sig i pdfium:s C-kod kan inte avbrytas med en signal,
+        # så workern som kör den dödas när tidsbudgeten är slut
+        results = recycling_map(
+            analyze_pdf_task, files_to_analyze, max_workers=num_workers, max_in_flight=2 * num_workers,
+            timeout_for=lambda file: ANALYSIS_TIMEOUT_SECONDS,
+        )
+        for file, future in tqdm(results, total=len(files_to_analyze), desc="Analyserar NYA PDF-filer"):
+            try:
+                pending_rows.append(future.result())
+            except TaskTimeout:
+                # Samma fingeravtryck som ett vanligt resultat, så filen inte analyseras om i onödan
+                source_size, source_mtime_ns = file_stat(file)
+                pending_rows.append({
+                    "status": "error_timeout", "chars_page_1": 0, "total_pages": 0,
+                    "full_path": str(file), "filename": file.name, "ocr_pages": "",
+                    "source_size": source_size, "source_mtime_ns": source_mtime_ns,
+                })
+            except Exception as e:
+                source_size, source_mtime_ns = file_stat(file)
+                pending_rows.append({
+                    "status": f"{WORKER_ERROR_PREFIX}{type(e).__name__}", "chars_page_1": 0, "total_pages": 0,
+                    "full_path": str(file), "filename": file.name, "ocr_pages": "",
+                    "source_size": source_size, "source_mtime_ns": source_mtime_ns,
+                })
+            if len(pending_rows) >= REPORT_FLUSH_EVERY:
+                append_to_report(pending_rows, ANALYSIS_REPORT_FILE)
+                pending_rows = []
+        append_to_report(pending_rows, ANALYSIS_REPORT_FILE)
         print("Analys av nya filer klar.")
     else:
         print("Inga nya filer att analysera. Allt är uppdaterat.")
 
-    # 6. Kombinera och spara
-    df_new = pd.DataFrame(new_analysis_results)
-    df_combined = pd.concat([df_existing, df_new], ignore_index=True)
+    # 7. Sammanfattning
+    df_combined = pd.read_csv(ANALYSIS_REPORT_FILE)
 
     print(f"\n--- Sammanfattning av TOTAL PDF-analys ---")
     if not df_combined.empty:
         print(df_combined['status'].value_counts())
 
-    df_combined.to_csv(ANALYSIS_REPORT_FILE, index=False, encoding='utf-8-sig')
     print(f"\nFullständig rapport sparad till:\n{ANALYSIS_REPORT_FILE}")
 
     print("\n✅ PDF-analys klar!")
@@ -12,15 +12,17 @@ import os
 import json
 import hashlib
 import pandas as pd
-import pdfplumber
 import docx
+import openpyxl
 import sys
 from bs4 import BeautifulSoup
 from pathlib import Path
 from tqdm import tqdm
 from email.parser import BytesParser
 from email import policy
-from concurrent.futures import ProcessPoolExecutor, as_completed
+import time
+from collections import Counter
+from datetime import date, datetime
 from multiprocessing import cpu_count
 
 # Lägg till src-mappen i sys.path för att säkerställa att utils kan importeras i workers
@@ -35,11 +37,61 @@ try:
 except ImportError:
     OCR_ENABLED = False
 
+# Tesseract trådar annars internt (OpenMP); med en worker per kärna blir det överbokning
+os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+
 # Importera centrala sökvägar
 from utils.paths import (
     RAW_DATA_DIR, PROCESSED_DIR, ANALYSIS_REPORT_FILE,
-    EXTRACTED_TEXT_DIR, ensure_directories
+    EXTRACTED_TEXT_DIR, EXTRACTION_LOG_FILE, OCR_CACHE_DIR, STALE_DOCUMENTS_FILE, TEXT_STORE_FILE,
+    ensure_directories
 )
+from utils.dedup import get_file_hash
+from utils.parallel import TaskTimeout, recycling_map
+from utils.extraction_journal import ExtractionJournal, is_partial, is_success
+from utils.ocr_cache import OcrCache, cache_key
+from utils.text_store import TextStore
+from utils.pdf_text import DEFAULT_PDF_ENGINE, count_pages, extract_page_texts, page_runs, parse_page_ranges
+
+# Motor för text-PDF:er: "pdfium" (snabb) eller "pdfplumber"
+PDF_ENGINE = DEFAULT_PDF_ENGINE
+
+# Utdataformat: "json" (en fil per dokument, zippas för Colab i steg 4)
+# eller "sqlite" (en kompakt databas, TEXT_STORE_FILE, som steg 04 kan strömma från)
+OUTPUT_FORMAT = "json"
+
+# Antal sidor som renderas till bilder åt gången vid OCR (begränsar minnet per worker)
+OCR_PAGE_WINDOW = 4
+
+# OCR-parametrar – ingår i OCR-cachens nyckel
+OCR_LANG = 'swe'
+OCR_DPI = 200
+
+# OCR-cache per process (träffar/missar skickas tillbaka till huvudprocessen med varje resultat)
+OCR_CACHE = OcrCache(OCR_CACHE_DIR)
+
+# OCR-PDF:er med fler OCR-sidor än så här delas upp i sidintervall som körs parallellt
+OCR_PAGES_PER_TASK = 10
+
+# Workers byts ut efter så här många uppgifter, eller när deras minne (RSS) passerar gränsen
+MAX_TASKS_PER_WORKER = 50
+MAX_WORKER_RSS_MB = 2048
+
+# Tidsbudget per uppgift: bas + per sida. En worker som överskrider den dödas och
+# uppgiften körs om i slutet med dubbel budget innan filen loggas som "timeout".
+TASK_TIMEOUT_BASE_SECONDS = 120
+TEXT_PAGE_TIMEOUT_SECONDS = 2
+OCR_PAGE_TIMEOUT_SECONDS = 60
+TIMEOUT_ATTEMPTS = 2
+
+# Antal kalkylbladsrader per logisk "sida" vid XLSX-extrahering
+XLSX_ROWS_PER_PAGE = 500
+
+# Motor per filtyp för övriga filer (loggas i journalen)
+OTHER_ENGINES = {
+    '.xlsx': "openpyxl", '.docx': "python-docx", '.html': "beautifulsoup",
+    '.eml': "email", '.txt': "text",
+}
 
 # ============================================================
 # HJÄLPFUNKTIONER
@@ -57,59 +109,176 @@ def get_unique_filename(original_path: Path, base_raw_dir: Path) -> str:
     return f"{path_hash}_{short_name}.json"
 
 
-def save_json(original_path: Path, pages_data: list, output_dir: Path, base_raw_dir: Path) -> str:
-    """Sparar extraherad data och metadata som JSON."""
+def get_relative_path(original_path: Path, base_raw_dir: Path) -> str:
+    try:
+        return str(original_path.relative_to(base_raw_dir))
+    except ValueError:
+        return original_path.name
+
+
+def source_fingerprint(file_path: Path) -> dict:
+    """Källfilens fingeravtryck: storlek, mtime_ns och sha256."""
+    st = file_path.stat()
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": get_file_hash(file_path)}
+
+
+def save_json(original_path: Path, pages_data: list, output_dir: Path, base_raw_dir: Path,
+              source: dict | None = None) -> str:
+    """
+    Sparar extraherad data och metadata (inkl. källfilens fingeravtryck) som JSON.
+
+    Skrivs atomärt (temporär fil + os.replace): en worker som dödas mitt i
+    skrivningen får inte lämna en halv JSON-fil som ser klar ut.
+    """
     try:
         output_filename = get_unique_filename(original_path, base_raw_dir)
         output_path = output_dir / output_filename
 
-        try:
-            relative_path = original_path.relative_to(base_raw_dir)
-        except ValueError:
-            relative_path = original_path.name
-
         data = {
             "filename": original_path.name,
-            "full_path": str(relative_path),
+            "full_path": get_relative_path(original_path, base_raw_dir),
+            "source": source,
             "pages": pages_data
         }
 
-        with open(output_path, 'w', encoding='utf-8') as f:
+        tmp_path = output_path.with_suffix('.json.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
             json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, output_path)
+        return "success"
+    except Exception as e:
+        return f"error_saving: {e}"
+
+
+_TEXT_STORE = None
+
+def save_to_store(original_path: Path, pages_data: list, base_raw_dir: Path, source: dict | None = None) -> str:
+    """Sparar extraherad data i textlagringen (en anslutning per worker-process)."""
+    global _TEXT_STORE
+    try:
+        if _TEXT_STORE is None:
+            _TEXT_STORE = TextStore(TEXT_STORE_FILE)
+        doc_id = Path(get_unique_filename(original_path, base_raw_dir)).stem
+        _TEXT_STORE.put(doc_id, original_path.name, get_relative_path(original_path, base_raw_dir), pages_data, source)
         return "success"
     except Exception as e:
         return f"error_saving: {e}"
 
+
+def save_document(original_path: Path, pages_data: list, source: dict | None = None) -> str:
+    """Sparar i det format som OUTPUT_FORMAT anger."""
+    if OUTPUT_FORMAT == "sqlite":
+        return save_to_store(original_path, pages_data, RAW_DATA_DIR, source)
+    return save_json(original_path, pages_data, EXTRACTED_TEXT_DIR, RAW_DATA_DIR, source)
+
+
+def list_extracted_ids() -> set[str]:
+    """Dokument-id:n för allt som redan är extraherat, oavsett format."""
+    ids = {p.stem for p in EXTRACTED_TEXT_DIR.glob('*.json')}
+    if TEXT_STORE_FILE.exists():
+        with TextStore(TEXT_STORE_FILE) as store:
+            ids |= store.doc_ids()
+    return ids
+
 # ============================================================
 # EXTRAHERINGSFUNKTIONER
 # ============================================================
 
-def extract_text_from_text_pdf(file_path: Path) -> list:
+def extract_text_from_text_pdf(file_path: Path, page_numbers: list | None = None) -> list:
     pages_data = []
-    with pdfplumber.open(file_path) as pdf:
-        for i, page in enumerate(pdf.pages):
-            text = page.extract_text()
-            if text:
-                pages_data.append({"page_number": i + 1, "text": text})
+    for page_number, text in extract_page_texts(file_path, PDF_ENGINE, page_numbers).items():
+        if text.strip():
+            pages_data.append({"page_number": page_number, "text": text})
     return pages_data
 
-def extract_text_from_ocr_pdf(file_path: Path) -> list:
+def _render_ocr_pages(file_path: Path, page_numbers):
+    """Renderar sidorna fönstervis, så att högst OCR_PAGE_WINDOW bilder ligger i minnet åt gången."""
+    for first, last in page_runs(page_numbers):
+        for start in range(first, last + 1, OCR_PAGE_WINDOW):
+            end = min(start + OCR_PAGE_WINDOW - 1, last)
+            images = convert_from_path(file_path, poppler_path=POPPLER_PATH, dpi=OCR_DPI,
+                                       first_page=start, last_page=end)
+            for offset, img in enumerate(images):
+                yield start + offset, img
+            del images
+
+def extract_text_from_ocr_pdf(file_path: Path, page_numbers: list | None = None) -> list:
+    """OCR:ar hela PDF:en, eller bara sidorna i page_numbers (1-baserade)."""
     if not OCR_ENABLED: return []
+    if page_numbers is None:
+        page_numbers = range(1, count_pages(file_path, PDF_ENGINE) + 1)
     pages_data = []
-    images = convert_from_path(file_path, poppler_path=POPPLER_PATH)
-    for i, img in enumerate(images):
-        text = pytesseract.image_to_string(img, lang='swe')
+    for page_number, img in _render_ocr_pages(file_path, page_numbers):
+        key = cache_key(img.tobytes(), img.mode, img.size, OCR_LANG, OCR_DPI)
+        text = OCR_CACHE.get(key)
+        if text is None:
+            text = pytesseract.image_to_string(img, lang=OCR_LANG)
+            OCR_CACHE.put(key, text)
+        img.close()
         if text:
-            pages_data.append({"page_number": i + 1, "text": text})
+            pages_data.append({"page_number": page_number, "text": text})
     return pages_data
 
+def extract_text_from_mixed_pdf(file_path: Path, total_pages: int, ocr_pages: list) -> list:
+    """Textsidor via den snabba textmotorn, OCR bara på sidorna som behöver det."""
+    ocr_set = set(ocr_pages)
+    text_pages = [n for n in range(1, total_pages + 1) if n not in ocr_set]
+    pages_data = extract_text_from_text_pdf(file_path, text_pages) if text_pages else []
+    pages_data += extract_text_from_ocr_pdf(file_path, sorted(ocr_set))
+    return sorted(pages_data, key=lambda p: p["page_number"])
+
+def _xlsx_cell_text(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    if isinstance(value, datetime) and value.time() == datetime.min.time():
+        return value.date().isoformat()
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return " ".join(str(value).split())
+
 def extract_text_from_xlsx(file_path: Path) -> list:
-    text = ""
-    xls = pd.ExcelFile(file_path)
-    for sheet_name in xls.sheet_names:
-        df = pd.read_excel(xls, sheet_name=sheet_name, header=None)
-        text += f"--- Flik: {sheet_name} ---\n{df.to_string(index=False, header=False)}\n\n"
-    return [{"page_number": 1, "text": text}]
+    """
+    Strömmar arbetsboken rad för rad (openpyxl read_only) och skriver varje rad
+    som en kompakt rad med " | " mellan cellerna. Stora flikar delas upp i
+    flera "sidor" om högst XLSX_ROWS_PER_PAGE rader, med flik och radintervall
+    i sidans metadata.
+    """
+    pages_data = []
+    wb = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        for ws in wb.worksheets:
+            # Dimensionen i filen kan vara fel; läs alla rader som faktiskt finns
+            ws.reset_dimensions()
+            lines, first_row, last_row = [], None, None
+
+            def flush():
+                rows = f"{first_row}-{last_row}"
+                pages_data.append({
+                    "page_number": len(pages_data) + 1,
+                    "text": f"--- Flik: {ws.title} (rad {rows}) ---\n" + "\n".join(lines),
+                    "sheet": ws.title, "rows": rows,
+                })
+
+            for row_number, row in enumerate(ws.iter_rows(values_only=True), start=1):
+                cells = [_xlsx_cell_text(v) for v in row]
+                while cells and not cells[-1]:
+                    cells.pop()
+                if not cells:
+                    continue
+                if first_row is None:
+                    first_row = row_number
+                last_row = row_number
+                lines.append(" | ".join(cells))
+                if len(lines) >= XLSX_ROWS_PER_PAGE:
+                    flush()
+                    lines, first_row = [], None
+            if lines:
+                flush()
+    finally:
+        wb.close()
+    return pages_data
 
 def extract_text_from_docx(file_path: Path) -> list:
     doc = docx.Document(file_path)
@@ -139,10 +308,20 @@ def extract_text_from_txt(file_path: Path) -> list:
 # ============================================================
 
 def process_single_file(task):
-    """Worker-funktion som körs i en egen process."""
-    file_path, status, file_type = task
-    
+    """
+    Worker-funktion som körs i en egen process. Returnerar (filnamn, status,
+    antal sidor, källfilens fingeravtryck, (OCR-cacheträffar, OCR-cachemissar)).
+    """
+    name, status, pages, source = extract_single_file(task)
+    return name, status, pages, source, OCR_CACHE.take_stats()
+
+def extract_single_file(task):
+    """Extraherar och sparar en fil. Returnerar (filnamn, status, antal sparade sidor, fingeravtryck)."""
+    file_path, status, file_type, page_info = task
+    source = None
+
     try:
+        source = source_fingerprint(file_path)
         pages_data = []
         extract_status = "success"
 
@@ -152,8 +331,13 @@ def process_single_file(task):
             elif status == 'ocr_candidate':
                 pages_data = extract_text_from_ocr_pdf(file_path)
                 extract_status = "success_ocr"
+            elif status == 'mixed':
+                total_pages, ocr_pages = page_info
+                pages_data = extract_text_from_mixed_pdf(file_path, total_pages, ocr_pages)
+                # Utan OCR sparas bara textsidorna; filen körs om när Tesseract finns
+                extract_status = "success_mixed" if OCR_ENABLED else "partial_no_ocr"
             else:
-                return file_path.name, f"skipped_{status}"
+                return file_path.name, f"skipped_{status}", 0, source
         else:
             # Övriga filtyper
             ext = file_path.suffix.lower()
@@ -164,13 +348,110 @@ def process_single_file(task):
             elif ext == '.txt': pages_data = extract_text_from_txt(file_path)
 
         if not pages_data:
-            return file_path.name, "empty_or_error"
+            return file_path.name, "empty_or_error", 0, source
 
-        save_status = save_json(file_path, pages_data, EXTRACTED_TEXT_DIR, RAW_DATA_DIR)
-        return file_path.name, extract_status if save_status == "success" else save_status
+        save_status = save_document(file_path, pages_data, source)
+        if save_status != "success":
+            return file_path.name, save_status, 0, source
+        return file_path.name, extract_status, len(pages_data), source
 
     except Exception as e:
-        return file_path.name, f"error: {str(e)[:100]}"
+        return file_path.name, f"error: {str(e)[:100]}", 0, source
+
+def process_pdf_part(part):
+    """
+    Worker-funktion för en del av en uppdelad OCR-PDF. Sparar inget, utan
+    returnerar (sidor, (OCR-cacheträffar, OCR-cachemissar)).
+    """
+    file_path, text_pages, ocr_pages = part
+    pages_data = extract_text_from_text_pdf(file_path, text_pages) if text_pages else []
+    pages_data += extract_text_from_ocr_pdf(file_path, ocr_pages)
+    return pages_data, OCR_CACHE.take_stats()
+
+def split_pdf_task(file_path: Path, total_pages: int, ocr_pages: list) -> list:
+    """
+    Delar upp en OCR-PDF i delar om högst OCR_PAGES_PER_TASK OCR-sidor.
+    Textsidorna (vid mixed) extraheras i den första delen.
+    """
+    ocr_set = set(ocr_pages)
+    text_pages = [n for n in range(1, total_pages + 1) if n not in ocr_set]
+    ocr_sorted = sorted(ocr_set)
+    return [
+        (file_path, text_pages if i == 0 else [], ocr_sorted[i:i + OCR_PAGES_PER_TASK])
+        for i in range(0, len(ocr_sorted), OCR_PAGES_PER_TASK)
+    ]
+
+def collect_pdf_part(assembly: dict, future) -> tuple[int, int]:
+    """
+    Lägger en avslutad del (future från process_job) till sin fils assembly.
+    En del som misslyckats eller tagit för lång tid gör att hela filen
+    misslyckas. Returnerar (OCR-cacheträffar, OCR-cachemissar).
+    """
+    hits = misses = 0
+    try:
+        (pages_data, (hits, misses)), seconds = future.result()
+        assembly["pages"].extend(pages_data)
+        assembly["seconds"] += seconds
+    except TaskTimeout:
+        assembly["error"] = "timeout"
+    except Exception as e:
+        assembly["error"] = f"error: {str(e)[:100]}"
+    assembly["remaining"] -= 1
+    return hits, misses
+
+def finish_split_pdf(file_path: Path, assembly: dict):
+    """
+    Sparar en uppdelad PDF när alla dess delar är klara.
+    Returnerar (filnamn, status, antal sidor, fingeravtryck).
+    """
+    try:
+        source = source_fingerprint(file_path)
+    except OSError as e:
+        return file_path.name, f"error: {str(e)[:100]}", 0, None
+    if assembly["error"]:
+        return file_path.name, assembly["error"], 0, source
+    pages_data = sorted(assembly["pages"], key=lambda p: p["page_number"])
+    if not pages_data:
+        return file_path.name, "empty_or_error", 0, source
+    save_status = save_document(file_path, pages_data, source)
+    if save_status != "success":
+        return file_path.name, save_status, 0, source
+    return file_path.name, assembly["status"], len(pages_data), source
+
+def task_timeout(job) -> float:
+    """Tidsbudget i sekunder för ett jobb, skalad efter antal text- och OCR-sidor."""
+    kind, payload = job
+    if kind == "part":
+        _, text_pages, ocr_pages = payload
+        n_text, n_ocr = len(text_pages), len(ocr_pages)
+    elif payload[3] is not None:
+        total_pages, ocr_pages = payload[3]
+        n_ocr = len(ocr_pages) if OCR_ENABLED else 0
+        n_text = total_pages - len(ocr_pages)
+    else:
+        n_text = n_ocr = 0
+    return TASK_TIMEOUT_BASE_SECONDS + n_text * TEXT_PAGE_TIMEOUT_SECONDS + n_ocr * OCR_PAGE_TIMEOUT_SECONDS
+
+def extraction_engine(file_path: Path, status: str | None) -> str:
+    """Motorn som används för filen; sparas i journalen tillsammans med resultatet."""
+    ocr_engine = "tesseract" if OCR_ENABLED else "no-ocr"
+    if status == 'text_based':
+        return PDF_ENGINE
+    if status == 'ocr_candidate':
+        return ocr_engine
+    if status == 'mixed':
+        return f"{PDF_ENGINE}+{ocr_engine}"
+    return OTHER_ENGINES.get(file_path.suffix.lower(), "none")
+
+def process_job(job):
+    """
+    Worker-ingång för både hela filer ("file") och delar av uppdelade PDF:er ("part").
+    Returnerar (resultat, sekunder).
+    """
+    kind, payload = job
+    start = time.perf_counter()
+    result = process_pdf_part(payload) if kind == "part" else process_single_file(payload)
+    return result, time.perf_counter() - start
 
 # ============================================================
 # HUVUDPROCESS
@@ -185,17 +466,98 @@ def main():
     num_cores = cpu_count()
     print(f"Använder {num_cores} processorkärnor.")
 
+    # Journalen minns tidigare försök: klara och permanent misslyckade filer hoppas
+    # över, tillfälliga fel körs om med backoff
+    journal = ExtractionJournal(EXTRACTION_LOG_FILE)
+    extracted_ids = list_extracted_ids()
+    skipped = Counter()
+
+    # Filer som redan är extraherade men har ersatts på plats; deras chunks flaggas som inaktuella
+    changed_files = set()
+
+    def source_changed(file_path: Path) -> bool:
+        """
+        Jämför filen med fingeravtrycket i journalen. Storlek och mtime räcker
+        i normalfallet; bara om de skiljer sig hashas filen för att avgöra om
+        innehållet faktiskt har ändrats.
+        """
+        try:
+            st = file_path.stat()
+        except OSError:
+            return False
+        current = {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+        known = journal.source(file_path)
+        if known is None:
+            # Utdata från före fingeravtrycken: nuvarande fil blir utgångsläget
+            journal.record_source(file_path, {**current, "sha256": None})
+            return False
+        if (known["size"], known["mtime_ns"]) == (current["size"], current["mtime_ns"]):
+            return False
+        sha256 = get_file_hash(file_path)
+        if sha256 and sha256 == known.get("sha256"):
+            journal.record_source(file_path, {**current, "sha256": sha256})
+            return False
+        return True
+
+    def should_process(file_path: Path, engine: str) -> bool:
+        extracted = Path(get_unique_filename(file_path, RAW_DATA_DIR)).stem in extracted_ids
+        if extracted and not is_partial(journal.status(file_path)):
+            reason = "done"
+        else:
+            reason = journal.skip_reason(file_path, engine)
+            if reason == "done":
+                # "done" i journalen men utan sparad text betyder att texten har tagits bort – kör om
+                return True
+        if reason is None:
+            return True
+        # Klara och permanent misslyckade filer körs om om källfilen har ersatts
+        if reason != "backoff" and source_changed(file_path):
+            if reason in ("done", "partial"):
+                changed_files.add(file_path)
+            return True
+        skipped[reason] += 1
+        return False
+
+    def flag_stale(file_path: Path):
+        """Markerar att chunks från filens tidigare version ska ersättas i steg 04."""
+        with open(STALE_DOCUMENTS_FILE, 'a', encoding='utf-8') as f:
+            f.write(json.dumps({
+                "filename": file_path.name,
+                "full_path": get_relative_path(file_path, RAW_DATA_DIR),
+            }, ensure_ascii=False) + "\n")
+
     # 1. Förbered uppgifter (Tasks)
     tasks = []
+    # Stora OCR-PDF:er delas upp i sidintervall (parts) som sätts ihop per fil (assemblies)
+    parts = []
+    assemblies = {}
 
     # PDF-filer från rapporten
     try:
-        df_analysis = pd.read_csv(ANALYSIS_REPORT_FILE)
+        df_analysis = pd.read_csv(ANALYSIS_REPORT_FILE, dtype={"ocr_pages": str})
         for _, row in df_analysis.iterrows():
             file_path = Path(row['full_path'])
-            output_filename = get_unique_filename(file_path, RAW_DATA_DIR)
-            if not (EXTRACTED_TEXT_DIR / output_filename).exists():
-                tasks.append((file_path, row['status'], 'pdf'))
+            status = row['status']
+            if not should_process(file_path, extraction_engine(file_path, status)):
+                continue
+            total_pages = int(row['total_pages'])
+            if status == 'mixed':
+                ocr_pages = parse_page_ranges(row['ocr_pages'])
+            elif status == 'ocr_candidate':
+                ocr_pages = list(range(1, total_pages + 1))
+            else:
+                ocr_pages = []
+            if status in ('ocr_candidate', 'mixed'):
+                if OCR_ENABLED and len(ocr_pages) > OCR_PAGES_PER_TASK:
+                    file_parts = split_pdf_task(file_path, total_pages, ocr_pages)
+                    assemblies[file_path] = {
+                        "status": "success_ocr" if status == 'ocr_candidate' else "success_mixed",
+                        "engine": extraction_engine(file_path, status),
+                        "remaining": len(file_parts), "pages": [], "error": None, "seconds": 0.0,
+                    }
+                    parts.extend(file_parts)
+                    continue
+            tasks.append((file_path, status, 'pdf', (total_pages, ocr_pages)))
     except FileNotFoundError:
         print("Varning: Ingen PDF-analysrapport hittades.")
 
@@ -203,31 +565,93 @@ def main():
     file_types = ['.xlsx', '.docx', '.html', '.eml', '.txt']
     for ext in file_types:
         for file_path in RAW_DATA_DIR.rglob(f'*{ext}'):
-            output_filename = get_unique_filename(file_path, RAW_DATA_DIR)
-            if not (EXTRACTED_TEXT_DIR / output_filename).exists():
-                tasks.append((file_path, None, 'other'))
-
-    if not tasks:
+            if should_process(file_path, extraction_engine(file_path, None)):
+                tasks.append((file_path, None, 'other', None))
+
+    if changed_files:
+        print(f"{len(changed_files)} redan extraherade filer har ersatts på plats och extraheras om.")
+    if skipped:
+        print(f"Hoppar över enligt journalen: {skipped['done']} klara, "
+              f"{skipped['partial']} utan OCR-sidor (körs om när Tesseract finns), "
+              f"{skipped['failed']} permanent misslyckade, {skipped['backoff']} i backoff.")
+
+    if not tasks and not parts:
+        journal.close()
         print("Inga nya filer att bearbeta. Allt är uppdaterat.")
         return
 
-    print(f"Startar bearbetning av {len(tasks)} filer...")
-
-    # 2. Kör parallellt
-    results = []
-    with ProcessPoolExecutor(max_workers=num_cores) as executor:
-        futures = {executor.submit(process_single_file, t): t for t in tasks}
-        
-        for future in tqdm(as_completed(futures), total=len(futures), desc="Extraherar text"):
-            results.append(future.result())
+    print(f"Startar bearbetning av {len(tasks) + len(assemblies)} filer "
+          f"({len(assemblies)} stora OCR-PDF:er uppdelade i {len(parts)} delar)...")
+
+    # 2. Kör parallellt – OCR-delarna skickas in först så att de inte blir kvar i slutet.
+    # Högst 2×kärnor uppgifter ligger inne åt gången och workers byts ut regelbundet,
+    # så att minnesläckor i pdfplumber/python-docx/Tesseract inte växer under långa körningar.
+    jobs = [("part", p) for p in parts] + [("file", t) for t in tasks]
+    status_counts = Counter()
+    cache_hits = cache_misses = 0
+    with journal:
+        def record(file_path: Path, status: str, seconds, pages: int, engine: str, source: dict | None):
+            status_counts[status] += 1
+            journal.record(file_path, status, seconds=seconds, pages=pages, engine=engine, source=source)
+            if file_path in changed_files and (is_success(status) or is_partial(status)):
+                flag_stale(file_path)
+
+        def handle(job, future):
+            kind, payload = job
+            file_path = payload[0]
+            if kind == "file":
+                seconds = source = None
+                try:
+                    (_, status, pages, source, (hits, misses)), seconds = future.result()
+                except TaskTimeout:
+                    status, pages, hits, misses = "timeout", 0, 0, 0
+                except Exception as e:
+                    status, pages, hits, misses = f"error: {str(e)[:100]}", 0, 0, 0
+                record(file_path, status, seconds, pages, extraction_engine(file_path, payload[1]), source)
+                return hits, misses
+
+            assembly = assemblies[file_path]
+            hits, misses = collect_pdf_part(assembly, future)
+            if assembly["remaining"] == 0:
+                assembly = assemblies.pop(file_path)
+                _, status, pages, source = finish_split_pdf(file_path, assembly)
+                record(file_path, status, assembly["seconds"], pages, assembly["engine"], source)
+            return hits, misses
+
+        # Jobb som överskrider sin tidsbudget läggs i en omkörningskö och körs
+        # om när allt annat är klart, med dubblad budget per försök.
+        pending, budget_scale = jobs, 1
+        for attempt in range(1, TIMEOUT_ATTEMPTS + 1):
+            retry_queue = []
+            results = recycling_map(
+                process_job, pending, max_workers=num_cores, max_in_flight=2 * num_cores,
+                max_tasks_per_child=MAX_TASKS_PER_WORKER, max_rss_mb=MAX_WORKER_RSS_MB,
+                timeout_for=lambda job, scale=budget_scale: scale * task_timeout(job),
+            )
+            desc = "Extraherar text" if attempt == 1 else f"Omkörning {attempt}"
+            for job, future in tqdm(results, total=len(pending), desc=desc):
+                if attempt < TIMEOUT_ATTEMPTS and isinstance(future.exception(), TaskTimeout):
+                    retry_queue.append(job)
+                    continue
+                hits, misses = handle(job, future)
+                cache_hits += hits
+                cache_misses += misses
+
+            if not retry_queue:
+                break
+            print(f"{len(retry_queue)} uppgifter överskred tidsgränsen – kör om dem med dubbel tidsbudget...")
+            pending, budget_scale = retry_queue, 2 * budget_scale
 
     # 3. Summering
-    df_res = pd.DataFrame(results, columns=['filename', 'status'])
     print("\n--- Resultat ---")
-    print(df_res['status'].value_counts())
-    
-    total_json = len(list(EXTRACTED_TEXT_DIR.glob('*.json')))
-    print(f"\nTotala antalet JSON-filer: {total_json}")
+    print(pd.Series(status_counts, name="count").sort_values(ascending=False).to_string())
+    print(f"Resultat per fil sparas i journalen: {EXTRACTION_LOG_FILE}")
+
+    if cache_hits or cache_misses:
+        print(f"\nOCR-cache: {cache_hits} träffar, {cache_misses} missar "
+              f"({cache_hits / (cache_hits + cache_misses):.0%} av OCR-sidorna återanvändes)")
+
+    print(f"\nTotalt antal extraherade dokument: {len(list_extracted_ids())}")
     print("\n✅ Textextrahering klar!")
 
 if __name__ == "__main__":
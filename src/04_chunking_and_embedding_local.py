@@ -6,17 +6,100 @@ from pathlib import Path
 from tqdm import tqdm
 import chromadb
 import gc
+import multiprocessing
+from collections import deque
+from itertools import chain
 from time import sleep
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
 from langchain_core.documents import Document
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_chroma import Chroma
-from langchain_huggingface import HuggingFaceEmbeddings
 
 # Importera projektets gemensamma paths
 import sys
 sys.path.append(str(Path(__file__).resolve().parent.parent))
-from src.utils.paths import PROJECT_ROOT, EXTRACTED_TEXT_DIR
+from src.utils.paths import (PROJECT_ROOT, EXTRACTED_TEXT_DIR, STALE_DOCUMENTS_FILE, TEXT_STORE_FILE,
+                             INGEST_MANIFEST_FILE, EMBEDDING_CACHE_DIR, EMBEDDING_CHECKPOINT_FILE,
+                             EMBEDDING_DEAD_LETTER_FILE)
+from src.utils.text_store import iter_extracted_documents
+from src.utils.chunk_ids import chunk_id, text_hash
+from src.utils.ingest_manifest import IngestManifest
+from src.utils.parallel import BackgroundWriter, ordered_map
+from src.utils.embedding_pool import init_embedding_worker, embed_chunks, pin_worker_threads
+from src.utils.embedding_cache import EmbeddingCache
+from src.utils.embedding_checkpoint import is_interrupted_rebuild, read_checkpoint, read_dead_letters, write_dead_letters
+from src.utils.vector_writer import VectorWriter
+
+def read_stale_documents() -> set:
+    """Relativa sökvägar (full_path) för dokument vars chunks är inaktuella."""
+    if not STALE_DOCUMENTS_FILE.exists():
+        return set()
+    with open(STALE_DOCUMENTS_FILE, 'r', encoding='utf-8') as f:
+        return {json.loads(line)['full_path'] for line in f if line.strip()}
+
+def iter_new_pages(source_dir: Path, manifest: IngestManifest, stats: dict):
+    """Strömmar en Document per sida som inte redan finns i databasen (enligt manifestet)."""
+    def report_error(file_path, e):
+        print(f'❌ Kunde inte läsa {file_path.name}: {e}')
+
+    for data in iter_extracted_documents(source_dir, TEXT_STORE_FILE, on_error=report_error):
+        stats['documents'] += 1
+        filename = data.get('filename')
+        full_path = data.get('full_path', 'Okänd sökväg')
+        for page in data.get('pages', []):
+            page_text = page.get('text', '')
+            page_num = page.get('page_number', 1)
+            if not page_text.strip():
+                continue
+            page_hash = text_hash(page_text)
+            if manifest.contains(full_path, page_num, page_hash):
+                stats['skipped'] += 1
+                continue
+            metadata = {'source': filename, 'full_path': full_path, 'page': page_num, 'page_hash': page_hash}
+            # XLSX-sidor pekar på flik och radintervall
+            for key in ('sheet', 'rows'):
+                if key in page:
+                    metadata[key] = page[key]
+            stats['pages'] += 1
+            yield Document(page_content=page_text, metadata=metadata)
+
+def iter_chunks(pages, text_splitter, stats: dict):
+    """
+    Delar upp sidorna i chunks en sida i taget. Varje chunk får ett
+    deterministiskt ID (chunk.id) och sitt index på sidan i metadata.
+    """
+    for page in pages:
+        for index, chunk in enumerate(text_splitter.split_documents([page])):
+            chunk.metadata['chunk_index'] = index
+            chunk.id = chunk_id(chunk.metadata['full_path'], chunk.metadata['page'], index, chunk.page_content)
+            stats['chunks'] += 1
+            yield chunk
+
+def bootstrap_manifest(collection, manifest: IngestManifest):
+    """
+    Fyller ett tomt manifest från en befintlig databas (en gång, vid första
+    körningen med manifest). Texthashen är okänd för äldre chunks.
+    """
+    total_count = collection.count()
+    batch_size = 5000
+    print(f'Manifest saknas – läser historik från {total_count} chunks en gång...')
+    for i in range(0, total_count, batch_size):
+        batch = collection.get(limit=batch_size, offset=i, include=['metadatas'])
+        manifest.add(
+            (m['full_path'], m['page'], m.get('page_hash'))
+            for m in batch['metadatas'] if m and 'full_path' in m and 'page' in m
+        )
+
+def batched(iterable, batch_size: int):
+    """Grupperar en ström i listor om högst batch_size element."""
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
 
 def run_local_embedding():
     # Sökvägsinställningar
@@ -26,6 +109,16 @@ def run_local_embedding():
     # True = Radera och bygg om från scratch
     # False = Inkrementell
     FULL_REBUILD = False
+
+    # "torch" = sentence-transformers (MPS/CUDA/CPU)
+    # "onnx"  = int8-kvantiserad modell via ONNX Runtime (endast CPU)
+    EMBEDDING_BACKEND = 'torch'
+
+    # Utan GPU: antal trådar per worker-process. Batcharna fördelas på
+    # os.cpu_count() // CPU_THREADS_PER_WORKER spawn-processer som var och en
+    # importerar om skriptet och laddar en egen kopia av modellen
+    # (ca 2,5 GB RAM per process med 'torch', mindre med 'onnx').
+    CPU_THREADS_PER_WORKER = 4
     
     # 1. Kolla enhet (GPU - M1/M2/M3)
     if torch.backends.mps.is_available():
@@ -38,11 +131,23 @@ def run_local_embedding():
         DEVICE = 'cpu'
         print(f"⚠️ Ingen GPU hittades, använder CPU (kommer gå extremt långsamt).")
 
+    # En avbruten körning återupptas via manifestet: sidor som redan är skrivna hoppas över.
+    # Det gäller även en avbruten full ombyggnad, som då inte raderar databasen igen.
+    checkpoint = read_checkpoint(EMBEDDING_CHECKPOINT_FILE)
+    wipe_database = FULL_REBUILD and not is_interrupted_rebuild(checkpoint)
+
     print('Läge: FULL REBUILD' if FULL_REBUILD else 'Läge: INKREMENTELL')
     print(f'Mål-databas: {DB_PERSIST_DIR}')
 
+    if checkpoint and not wipe_database:
+        print(f"↻ Förra körningen avbröts efter batch {checkpoint['batch']} "
+              f"({checkpoint['chunks_written']} chunks, {checkpoint['time']}). Fortsätter där den slutade.")
+    dead_letters = read_dead_letters(EMBEDDING_DEAD_LETTER_FILE)
+    if dead_letters and not wipe_database:
+        print(f'↻ {len(dead_letters)} chunks misslyckades förra körningen och tas med igen.')
+
     # 2. Hantera databasen
-    if FULL_REBUILD:
+    if wipe_database:
         if DB_PERSIST_DIR.exists():
             print('Raderar gammal databas för full ombyggnad...')
             try:
@@ -50,123 +155,204 @@ def run_local_embedding():
             except Exception as e:
                 print(f"Kunde inte radera, försök manuellt: {e}")
         DB_PERSIST_DIR.mkdir(parents=True, exist_ok=True)
-        existing_sources = set()
+        for leftover in (INGEST_MANIFEST_FILE, EMBEDDING_CHECKPOINT_FILE, EMBEDDING_DEAD_LETTER_FILE):
+            leftover.unlink(missing_ok=True)
+        manifest = IngestManifest(INGEST_MANIFEST_FILE)
+        STALE_DOCUMENTS_FILE.unlink(missing_ok=True)
         print('Startar full ombyggnad.')
     else:
         DB_PERSIST_DIR.mkdir(parents=True, exist_ok=True)
+        manifest = IngestManifest(INGEST_MANIFEST_FILE)
         try:
             client = chromadb.PersistentClient(path=str(DB_PERSIST_DIR))
             collection = client.get_collection('langchain')
-            
-            existing_sources = set()
-            total_count = collection.count()
-            batch_size = 5000
-            print(f'Hittade befintlig databas med {total_count} chunks. Läser historik...')
-            
-            for i in range(0, total_count, batch_size):
-                batch = collection.get(limit=batch_size, offset=i, include=['metadatas'])
-                for m in batch['metadatas']:
-                    if m:
-                        key = str(m.get('source', '')) + '__page_' + str(m.get('page', ''))
-                        existing_sources.add(key)
-                        
-            print(f'Historik inläst! Unika sidor redan i databasen: {len(existing_sources)}')
+
+            # Ta bort chunks från filer som har ersatts på plats (flaggade i steg 03),
+            # så att de nya versionerna läses in nedan
+            stale_paths = read_stale_documents()
+            if stale_paths:
+                print(f'Tar bort inaktuella chunks för {len(stale_paths)} ändrade filer...')
+                for stale_path in stale_paths:
+                    collection.delete(where={'full_path': stale_path})
+                manifest.remove(stale_paths)
+                STALE_DOCUMENTS_FILE.unlink()
+
+            # Efter en avbruten körning är manifestet redan korrekt, även om det är
+            # tomt – databasen kan då innehålla sidor som bara är delvis skrivna
+            if not len(manifest) and collection.count() and not checkpoint:
+                bootstrap_manifest(collection, manifest)
+            print(f'Hittade befintlig databas. Unika sidor redan i databasen: {len(manifest)}')
         except Exception as e:
-            existing_sources = set()
             print(f'Kunde inte läsa historik (kan vara tom). Fel: {e}')
 
-    # 3. Ladda dokument
-    documents = []
-    skipped = 0
-    all_files = list(UNZIP_DIR.rglob('*.json'))
-    print(f'Hittade {len(all_files)} JSON-filer lokalt i {UNZIP_DIR}.')
-    
-    if not all_files:
-        print("❌ Inga JSON-filer hittades. Har du kört text_extraction-steget nyligen?")
-        return
-        
-    for file_path in tqdm(all_files, desc='Laddar dokument', unit='fil'):
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            filename = data.get('filename', file_path.name)
-            full_path = data.get('full_path', 'Okänd sökväg')
-            for page in data.get('pages', []):
-                page_text = page.get('text', '')
-                page_num = page.get('page_number', 1)
-                if not page_text.strip():
-                    continue
-                source_key = filename + '__page_' + str(page_num)
-                if source_key in existing_sources:
-                    skipped += 1
-                    continue
-                metadata = {'source': filename, 'full_path': full_path, 'page': page_num}
-                documents.append(Document(page_content=page_text, metadata=metadata))
-        except Exception as e:
-            print(f'❌ Kunde inte läsa {file_path.name}: {e}')
+    # 3–6. Strömmande pipeline: fil -> sidor -> chunks -> batchar -> embeddings.
+    # Inget samlas i minnet, så embedding startar direkt och minnet håller sig
+    # konstant oavsett korpusens storlek.
+    print(f'Läser extraherad text från {TEXT_STORE_FILE.name} och {UNZIP_DIR}...')
+    text_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=2000,
+        chunk_overlap=400,
+        separators=['\n\n', '\n', ' ', '']
+    )
+    stats = {'documents': 0, 'pages': 0, 'skipped': 0, 'chunks': 0}
+    pages = iter_new_pages(UNZIP_DIR, manifest, stats)
+    chunks = iter_chunks(pages, text_splitter, stats)
 
-    print(f'Nya sidor att lägga in: {len(documents)}')
-    print(f'Hoppades över (redan i DB): {skipped}')
+    # Modellen embeddar stora batchar, medan en skrivartråd gör upsert av
+    # färdiga vektorer till Chroma. Kön mellan dem rymmer WRITE_QUEUE_SIZE
+    # batchar, så modellen väntar aldrig på SQLite/HNSW.
+    EMBED_BATCH_SIZE = 512
+    WRITE_QUEUE_SIZE = 2
 
-    # 4. Chunking
-    if not documents:
-        print('Inga nya dokument. Databasen är uppdaterad!')
-        all_chunks = []
-    else:
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=2000,
-            chunk_overlap=400,
-            separators=['\n\n', '\n', ' ', '']
-        )
-        print('Dela upp dokumenten i chunks...')
-        all_chunks = text_splitter.split_documents(documents)
-        print(f'Dokument (sidor): {len(documents)}')
-        print(f'Chunks skapade:   {len(all_chunks)}')
-
-    # 5. Embedding-modell 
-    if all_chunks:
-        model_name = 'BAAI/bge-m3'
-        print(f'Laddar embedding-modell ({model_name}) på M1 Max ({DEVICE})...')
-        embedding_model = HuggingFaceEmbeddings(
-            model_name=model_name,
-            model_kwargs={'device': DEVICE},
-            encode_kwargs={'normalize_embeddings': False, 'batch_size': 32} 
-        )
-        print('✅ Modell laddad.')
-    else:
-        print('Inga chunks att embedda.')
-        return
-
-    # 6. Bygg databasen
-    if all_chunks:
-        print(f'Bygger databas med {len(all_chunks)} nya chunks...')
-        db = Chroma(
-            persist_directory=str(DB_PERSIST_DIR),
-            embedding_function=embedding_model
-        )
-        
-        # Batch size 64 verkar vara "sweet spot" för BGE-M3 + MPS utan att cachen fylls direkt
-        batch_size = 64
-        
-        for i in tqdm(range(0, len(all_chunks), batch_size), desc='Skapar embeddings', unit='batch'):
-            batch = all_chunks[i:i + batch_size]
-            try:
-                db.add_documents(batch)
-            except Exception as e:
-                print(f"❌ Fel vid batch {i}: {e}")
-                if torch.backends.mps.is_available():
-                    torch.mps.empty_cache()
-                gc.collect()
-                sleep(1) # Ge datorn en liten minipaus
-                continue
-            
-            # Tömmer cachen var 10:e batch för att Macen ska kunna garbage-collecta
-            if (i // batch_size) % 10 == 0: 
+    # Inom en stor batch: "length" sorterar chunks efter tokenlängd och packar
+    # delbatchar om högst MAX_BATCH_TOKENS (paddade) tokens, "fixed" kör
+    # delbatchar om 32 i korpusordning (se benchmarks/bench_embedding_batching.py)
+    EMBEDDING_BATCHING = 'length'
+    MAX_BATCH_TOKENS = 16384
+    MAX_SUB_BATCH_SIZE = 256
+
+    # Chunks från misslyckade batchar görs om i slutet i mindre batchar
+    RETRY_BATCH_SIZE = 8
+
+    model_name = 'BAAI/bge-m3'
+    batching = {
+        'strategy': EMBEDDING_BATCHING,
+        'batch_size': 32,
+        'max_tokens': MAX_BATCH_TOKENS,
+        'max_batch_size': MAX_SUB_BATCH_SIZE,
+    }
+    # Delbatcharna planeras av embed_in_batches och ska köras i ett svep
+    encode_kwargs = {'normalize_embeddings': False, 'batch_size': MAX_SUB_BATCH_SIZE}
+
+    batches = batched(chunks, EMBED_BATCH_SIZE)
+    first_batch = next(batches, None)
+    loaded = first_batch is not None
+    if loaded:
+        # 5. Embedding-modellen laddas först när det finns något att embedda.
+        # Med GPU embeddar en tråd medan huvudtråden chunkar nästa batch; på
+        # CPU embeddar flera processer med låst antal trådar var.
+        cpu_workers = max(1, (os.cpu_count() or 1) // CPU_THREADS_PER_WORKER) if DEVICE == 'cpu' else 1
+
+        def make_executor():
+            if cpu_workers > 1:
+                print(f'Laddar embedding-modell ({model_name}, {EMBEDDING_BACKEND}) i {cpu_workers} processer '
+                      f'med {CPU_THREADS_PER_WORKER} trådar var...')
+                # Ärvs av workers, som importerar torch innan initializern körs
+                pin_worker_threads(CPU_THREADS_PER_WORKER)
+                return ProcessPoolExecutor(
+                    max_workers=cpu_workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=init_embedding_worker,
+                    initargs=(CPU_THREADS_PER_WORKER, EMBEDDING_BACKEND, model_name, DEVICE, encode_kwargs, batching),
+                )
+            print(f'Laddar embedding-modell ({model_name}, {EMBEDDING_BACKEND}) på M1 Max ({DEVICE})...')
+            return ThreadPoolExecutor(
+                max_workers=1,
+                initializer=init_embedding_worker,
+                initargs=(None, EMBEDDING_BACKEND, model_name, DEVICE, encode_kwargs, batching),
+            )
+
+        client = chromadb.PersistentClient(path=str(DB_PERSIST_DIR))
+        # Samma samling som langchain_chroma använder (och appen läser)
+        collection = client.get_or_create_collection('langchain', embedding_function=None)
+
+        # 6. Bygg databasen. Skrivaren registrerar en sida i manifestet först
+        # när alla dess chunks är skrivna (se utils/vector_writer.py)
+        vector_writer = VectorWriter(collection, manifest, EMBEDDING_CHECKPOINT_FILE, rebuild=FULL_REBUILD)
+
+        # Embeddings som redan finns i cachen (samma modell och text) hämtas
+        # därifrån, och bara resten skickas till modellen. En ombyggnad från
+        # en fylld cache blir då i praktiken bara skrivningar till Chroma.
+        cache_key = model_name + ('-onnx-int8' if EMBEDDING_BACKEND == 'onnx' else '')
+        embedding_cache = EmbeddingCache(EMBEDDING_CACHE_DIR, cache_key)
+        looked_up = deque()  # (batch, hashar, cachade vektorer) i samma ordning som ordered_map ger svaren
+
+        def uncached_chunks(batches):
+            for batch in batches:
+                hashes = [text_hash(chunk.page_content) for chunk in batch]
+                cached = embedding_cache.get(hashes)
+                looked_up.append((batch, hashes, cached))
+                yield [chunk for chunk, h in zip(batch, hashes) if h not in cached]
+
+        # Alla vektorer går till en enda skrivare, i batchordning
+        with embedding_cache, BackgroundWriter(vector_writer.write_batch, max_queued=WRITE_QUEUE_SIZE) as writer:
+            with make_executor() as executor:
+                results = ordered_map(executor, embed_chunks, uncached_chunks(chain([first_batch], batches)),
+                                      max_in_flight=2 * cpu_workers)
+                for batch_number, (_, future) in enumerate(tqdm(results, desc='Skapar embeddings', unit='batch')):
+                    batch, hashes, cached = looked_up.popleft()
+                    try:
+                        new_embeddings = future.result()
+                        missing_hashes = [h for h in hashes if h not in cached]
+                        embedding_cache.put(missing_hashes, new_embeddings)
+                        cached.update(zip(missing_hashes, new_embeddings))
+                        embeddings = [cached[h] for h in hashes]
+                    except Exception as e:
+                        vector_writer.fail(batch, str(e))
+                        print(f"❌ Fel vid batch {batch_number}: {e}")
+                        if torch.backends.mps.is_available():
+                            torch.mps.empty_cache()
+                        gc.collect()
+                        sleep(1) # Ge datorn en liten minipaus
+                        continue
+                    writer.submit(batch_number, batch, embeddings)
+
+                    # Tömmer cachen var 10:e batch för att Macen ska kunna garbage-collecta
+                    if batch_number % 10 == 0:
+                        if torch.backends.mps.is_available():
+                            torch.mps.empty_cache()
+                        gc.collect()
+            writer.flush()
+
+            # 7. Misslyckade chunks görs om i små batchar med nyladdad modell
+            # (poolen kan vara trasig efter t.ex. slut på minne)
+            if vector_writer.failed_chunks:
+                retry_chunks = vector_writer.take_failed_chunks()
+                print(f'Försöker igen med {len(retry_chunks)} chunks i batchar om {RETRY_BATCH_SIZE}...')
                 if torch.backends.mps.is_available():
                     torch.mps.empty_cache()
                 gc.collect()
+                with make_executor() as executor:
+                    for retry_number, retry_batch in enumerate(batched(retry_chunks, RETRY_BATCH_SIZE)):
+                        try:
+                            embeddings = executor.submit(embed_chunks, retry_batch).result()
+                        except Exception as e:
+                            vector_writer.fail(retry_batch, str(e))
+                            continue
+                        embedding_cache.put([text_hash(chunk.page_content) for chunk in retry_batch], embeddings)
+                        writer.submit(f'omförsök {retry_number}', retry_batch, embeddings, True)
+                writer.flush()
+
+                # Sidor vars alla chunks nu är skrivna kan registreras i manifestet
+                vector_writer.commit_retried_pages()
 
-        print(f'🎉 DATABAS KLAR! Totalt: {db._collection.count()} chunks sparade lokalt på din Mac.')
+        vector_writer.finish()
+    manifest.close()
+    failed_chunks = vector_writer.failed_chunks if loaded else []
+    if loaded:
+        hits, misses = embedding_cache.take_stats()
+        print(f"Embedding-cache: {hits} träffar, {misses} nya embeddings")
+
+    # Körningen är klar: ingen checkpoint behövs, och chunks som fortfarande
+    # misslyckas listas i dead letter-filen (deras sidor tas med nästa gång)
+    EMBEDDING_CHECKPOINT_FILE.unlink(missing_ok=True)
+    if failed_chunks:
+        write_dead_letters(EMBEDDING_DEAD_LETTER_FILE, failed_chunks)
+        print(f"⚠️ {len(failed_chunks)} chunks kunde inte embeddas – se {EMBEDDING_DEAD_LETTER_FILE.name}")
+    else:
+        EMBEDDING_DEAD_LETTER_FILE.unlink(missing_ok=True)
+
+    print(f"Dokument lästa: {stats['documents']}")
+    print(f"Nya sidor:      {stats['pages']}")
+    print(f"Hoppades över (redan i DB): {stats['skipped']}")
+    print(f"Chunks skapade: {stats['chunks']}")
+
+    if not stats['documents']:
+        print("❌ Inga extraherade dokument hittades. Har du kört text_extraction-steget nyligen?")
+    elif not loaded:
+        print('Inga nya dokument. Databasen är uppdaterad!')
+    else:
+        print(f'🎉 DATABAS KLAR! Totalt: {collection.count()} chunks sparade lokalt på din Mac.')
 
 if __name__ == '__main__':
     run_local_embedding()
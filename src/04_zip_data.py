@@ -1,7 +1,8 @@
 """
 zip_data.py – Zippa extraherade textfiler för Colab-uppladdning
 
-Skapar en ZIP-fil av alla JSON-filer i extracted_text/-mappen
+Skapar en ZIP-fil av alla JSON-filer i extracted_text/-mappen (och
+textlagringen extracted_text.sqlite om steg 3 körts med OUTPUT_FORMAT = "sqlite")
 som sedan kan laddas upp till Google Drive för chunking & embedding i Colab.
 """
 
@@ -9,14 +10,16 @@ import zipfile
 from pathlib import Path
 from tqdm import tqdm
 
-from utils.paths import EXTRACTED_TEXT_DIR, ZIP_OUTPUT_FILE, ensure_directories
+from utils.paths import EXTRACTED_TEXT_DIR, TEXT_STORE_FILE, ZIP_OUTPUT_FILE, ensure_directories
+from utils.text_store import TextStore
 
 
-def create_zip(source_dir: Path, output_file: Path):
-    """Zippar alla JSON-filer i source_dir till output_file."""
+def create_zip(source_dir: Path, output_file: Path, store_file: Path | None = None):
+    """Zippar alla JSON-filer i source_dir (och store_file om den finns) till output_file."""
     json_files = list(source_dir.glob("*.json"))
+    has_store = store_file is not None and store_file.exists()
 
-    if not json_files:
+    if not json_files and not has_store:
         print(f"Inga JSON-filer hittades i {source_dir}. Inget att zippa.")
         return
 
@@ -26,6 +29,11 @@ def create_zip(source_dir: Path, output_file: Path):
         for file_path in tqdm(json_files, desc="Zippar filer"):
             # Spara med bara filnamnet (platt struktur i ZIP:en)
             zf.write(file_path, arcname=file_path.name)
+        if has_store:
+            print(f"Lägger till textlagringen {store_file.name}...")
+            with TextStore(store_file) as store:
+                store.checkpoint()
+            zf.write(store_file, arcname=store_file.name)
 
     size_mb = output_file.stat().st_size / (1024 * 1024)
     print(f"\n✅ ZIP-fil skapad: {output_file} ({size_mb:.1f} MB)")
@@ -38,7 +46,7 @@ def main():
     print("=" * 60)
 
     ensure_directories()
-    create_zip(EXTRACTED_TEXT_DIR, ZIP_OUTPUT_FILE)
+    create_zip(EXTRACTED_TEXT_DIR, ZIP_OUTPUT_FILE, TEXT_STORE_FILE)
 
 
 if __name__ == "__main__":
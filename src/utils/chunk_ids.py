@@ -0,0 +1,21 @@
+"""
+Deterministiska ID:n för chunks i vektordatabasen.
+
+Ett chunk-ID byggs av (hash av full_path, sida, chunkindex, hash av texten),
+så samma chunk får alltid samma ID. Skrivningar med upsert blir därmed
+idempotenta: en omstartad körning skriver över i stället för att duplicera,
+och enskilda chunks kan uppdateras eller tas bort exakt.
+"""
+
+import hashlib
+
+
+def text_hash(text: str) -> str:
+    """sha1 av texten (hex)."""
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def chunk_id(full_path: str, page, chunk_index: int, text: str) -> str:
+    """Stabilt ID, t.ex. "3f2a…:p12:c0:9b1c…"."""
+    path_hash = hashlib.sha1(str(full_path).encode("utf-8")).hexdigest()[:16]
+    return f"{path_hash}:p{page}:c{chunk_index}:{text_hash(text)[:16]}"
@@ -0,0 +1,135 @@
+"""
+Embedding-backends för BGE-M3.
+
+  - "torch": HuggingFaceEmbeddings (sentence-transformers/PyTorch), som tidigare
+  - "onnx":  modellen exporterad till ONNX med dynamisk int8-kvantisering och
+             körd med ONNX Runtime på CPU. Exporten görs en gång och sparas
+             i ONNX_MODEL_DIR.
+
+Båda ger samma vektorer som BGE-M3:s täta embedding (CLS-token,
+L2-normaliserad) och kan användas där langchain förväntar sig Embeddings.
+"""
+
+import tempfile
+from pathlib import Path
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from src.utils.paths import ONNX_MODEL_DIR
+from src.utils.embedding_batching import embed_in_batches, token_counter
+
+EMBEDDING_BACKENDS = ("torch", "onnx")
+ONNX_MODEL_FILE = "model_int8.onnx"
+MAX_SEQUENCE_LENGTH = 8192
+
+
+def export_onnx_int8(model_name: str, output_dir: Path) -> Path:
+    """
+    Exporterar modellens CLS-embedding till ONNX och kvantiserar vikterna
+    till int8 (dynamisk kvantisering). Tokenizern sparas i samma mapp.
+    Kräver torch och transformers; själva körningen kräver bara onnxruntime.
+    """
+    try:
+        import onnx  # noqa: F401 – krävs av både torch.onnx.export och kvantiseringen
+    except ImportError as e:
+        raise ImportError("ONNX-exporten kräver paketet 'onnx' (uv sync eller pip install onnx)") from e
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    class ClsEncoder(torch.nn.Module):
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+
+        def forward(self, input_ids, attention_mask):
+            return self.model(input_ids=input_ids, attention_mask=attention_mask).last_hidden_state[:, 0]
+
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    encoder = ClsEncoder(AutoModel.from_pretrained(model_name)).eval()
+    sample = tokenizer(["Länsstyrelsen beslutar"], return_tensors="pt")
+
+    # fp32-modellen är över 2 GB och sparas med extern data, så den hålls i en tillfällig mapp
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        fp32_path = Path(tmp_dir) / "model_fp32.onnx"
+        with torch.no_grad():
+            torch.onnx.export(
+                encoder,
+                (sample["input_ids"], sample["attention_mask"]),
+                str(fp32_path),
+                input_names=["input_ids", "attention_mask"],
+                output_names=["embedding"],
+                dynamic_axes={
+                    "input_ids": {0: "batch", 1: "sequence"},
+                    "attention_mask": {0: "batch", 1: "sequence"},
+                    "embedding": {0: "batch"},
+                },
+                opset_version=17,
+                dynamo=False,
+            )
+        quantize_dynamic(str(fp32_path), str(output_dir / ONNX_MODEL_FILE), weight_type=QuantType.QInt8)
+
+    tokenizer.save_pretrained(output_dir)
+    return output_dir / ONNX_MODEL_FILE
+
+
+class OnnxEmbeddings(Embeddings):
+    """BGE-M3 (int8, ONNX Runtime på CPU) med langchains Embeddings-gränssnitt."""
+
+    def __init__(self, model_dir: Path = ONNX_MODEL_DIR, num_threads: int | None = None,
+                 max_batch_tokens: int = 16384):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        options = ort.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+            options.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(
+            str(Path(model_dir) / ONNX_MODEL_FILE), options, providers=["CPUExecutionProvider"]
+        )
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        self.max_batch_tokens = max_batch_tokens
+        self._count_tokens = token_counter(self.tokenizer, MAX_SEQUENCE_LENGTH)
+
+    def _embed_batch(self, texts: list[str]) -> list[list[float]]:
+        encoded = self.tokenizer(texts, padding=True, truncation=True, max_length=MAX_SEQUENCE_LENGTH,
+                                 return_tensors="np")
+        (embeddings,) = self.session.run(None, {
+            "input_ids": encoded["input_ids"].astype(np.int64),
+            "attention_mask": encoded["attention_mask"].astype(np.int64),
+        })
+        embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+        return embeddings.tolist()
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return embed_in_batches(self._embed_batch, texts, "length", count_tokens=self._count_tokens,
+                                max_tokens=self.max_batch_tokens)
+
+    def embed_query(self, text: str) -> list[float]:
+        return self._embed_batch([text])[0]
+
+
+def load_embeddings(backend: str = "torch", model_name: str = "BAAI/bge-m3", device: str = "cpu",
+                    encode_kwargs: dict | None = None, num_threads: int | None = None) -> Embeddings:
+    """
+    Skapar embedding-modellen för vald backend. För "onnx" exporteras
+    modellen till ONNX_MODEL_DIR första gången (tar några minuter).
+    """
+    if backend not in EMBEDDING_BACKENDS:
+        raise ValueError(f"Okänd embedding-backend: {backend!r} (välj bland {EMBEDDING_BACKENDS})")
+    if backend == "onnx":
+        if not (ONNX_MODEL_DIR / ONNX_MODEL_FILE).exists():
+            print(f"Exporterar {model_name} till ONNX (int8) i {ONNX_MODEL_DIR}...")
+            export_onnx_int8(model_name, ONNX_MODEL_DIR)
+        return OnnxEmbeddings(ONNX_MODEL_DIR, num_threads=num_threads)
+
+    from langchain_huggingface import HuggingFaceEmbeddings
+    return HuggingFaceEmbeddings(
+        model_name=model_name,
+        model_kwargs={'device': device},
+        encode_kwargs=encode_kwargs or {'normalize_embeddings': False},
+    )
@@ -0,0 +1,66 @@
+"""
+Batchning av texter inför embedding.
+
+Modellen paddar varje batch till den längsta sekvensen i batchen, så en
+batch med en lång chunk och många korta tabellfragment lägger det mesta av
+beräkningen på padding. Strategierna:
+
+  - "fixed":  batchar om batch_size texter i ursprunglig ordning
+  - "length": texterna sorteras efter tokenlängd och packas i batchar där
+              (antal texter x längsta text) håller sig inom max_tokens
+
+Embeddings returneras alltid i texternas ursprungliga ordning.
+"""
+
+BATCHING_STRATEGIES = ("fixed", "length")
+
+
+def estimate_tokens(texts: list[str]) -> list[int]:
+    """Grov uppskattning av tokenlängd (ca 4 tecken per token) när ingen tokenizer finns."""
+    return [len(text) // 4 + 2 for text in texts]
+
+
+def plan_batches(lengths: list[int], strategy: str = "length", batch_size: int = 32,
+                 max_tokens: int = 16384, max_batch_size: int = 256) -> list[list[int]]:
+    """
+    Delar upp texterna (givna som tokenlängder) i batchar av index.
+    För "length" är batch_size oanvänd och max_batch_size ett tak per batch.
+    """
+    if strategy not in BATCHING_STRATEGIES:
+        raise ValueError(f"Okänd batchningsstrategi: {strategy!r} (välj bland {BATCHING_STRATEGIES})")
+    indices = list(range(len(lengths)))
+    if strategy == "fixed":
+        return [indices[i:i + batch_size] for i in range(0, len(indices), batch_size)]
+
+    batches = []
+    batch = []
+    for i in sorted(indices, key=lambda i: lengths[i]):
+        # Sorterat stigande, så text i är den längsta i batchen om den läggs till
+        if batch and ((len(batch) + 1) * max(lengths[i], 1) > max_tokens or len(batch) >= max_batch_size):
+            batches.append(batch)
+            batch = []
+        batch.append(i)
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def embed_in_batches(embed, texts: list[str], strategy: str = "length", count_tokens=estimate_tokens,
+                     **plan_kwargs) -> list:
+    """
+    Embeddar texterna batch för batch med embed(list[str]) -> list[vektor]
+    och returnerar vektorerna i texternas ursprungliga ordning.
+    """
+    embeddings = [None] * len(texts)
+    for batch in plan_batches(count_tokens(texts), strategy, **plan_kwargs):
+        for i, vector in zip(batch, embed([texts[i] for i in batch])):
+            embeddings[i] = vector
+    return embeddings
+
+
+def token_counter(tokenizer, max_length: int = 8192):
+    """count_tokens baserad på modellens tokenizer (t.ex. transformers.AutoTokenizer)."""
+    def count_tokens(texts: list[str]) -> list[int]:
+        encoded = tokenizer(texts, add_special_tokens=True, truncation=True, max_length=max_length)
+        return [len(ids) for ids in encoded["input_ids"]]
+    return count_tokens
@@ -0,0 +1,128 @@
+"""
+Innehållsadresserad cache för embeddings på disk.
+
+Vektorerna ligger som float16-rader i en fil som läses via np.memmap, och ett
+SQLite-index mappar sha1 av chunkens text till radnummer. Varje modell får en
+egen undermapp, så nyckeln är i praktiken (modellnamn, texthash).
+
+En full ombyggnad av vektordatabasen, ett experiment med chunkstorlek eller
+en återställning efter en korrupt databas behöver då bara embedda text som
+aldrig har embeddats förut.
+
+Raderna skrivs till vektorfilen innan indexet uppdateras, så ett avbrott kan
+som värst lämna oanvända rader i slutet av filen.
+"""
+
+import re
+import sqlite3
+from pathlib import Path
+
+import numpy as np
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    text_hash   TEXT PRIMARY KEY,
+    row         INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS meta (
+    key         TEXT PRIMARY KEY,
+    value       TEXT NOT NULL
+);
+"""
+
+# SQLite tillåter ett begränsat antal parametrar per fråga
+_LOOKUP_CHUNK = 500
+
+
+class EmbeddingCache:
+    """float16-vektorer per (modell, texthash). Används som context manager."""
+
+    def __init__(self, cache_dir: Path, model_key: str):
+        self.dir = Path(cache_dir) / re.sub(r"[^\w.-]+", "_", model_key)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.vectors_path = self.dir / "vectors.f16"
+        self._conn = sqlite3.connect(self.dir / "index.sqlite")
+        self._conn.executescript(_SCHEMA)
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'dim'").fetchone()
+        self.dim = int(row[0]) if row else None
+        self._rows = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        self._matrix = None
+        self.hits = 0
+        self.misses = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def __len__(self):
+        return self._rows
+
+    def _lookup(self, text_hashes) -> dict[str, int]:
+        unique = list(dict.fromkeys(text_hashes))
+        rows = {}
+        for i in range(0, len(unique), _LOOKUP_CHUNK):
+            part = unique[i:i + _LOOKUP_CHUNK]
+            rows.update(self._conn.execute(
+                f"SELECT text_hash, row FROM entries WHERE text_hash IN ({','.join('?' * len(part))})", part
+            ))
+        return rows
+
+    def _read_rows(self, rows: list[int]) -> np.ndarray:
+        # Mappa om filen när den har vuxit sedan förra läsningen
+        if self._matrix is None or max(rows) >= self._matrix.shape[0]:
+            count = self.vectors_path.stat().st_size // (2 * self.dim)
+            self._matrix = np.memmap(self.vectors_path, dtype=np.float16, mode="r", shape=(count, self.dim))
+        return np.asarray(self._matrix[rows], dtype=np.float32)
+
+    def get(self, text_hashes: list[str]) -> dict[str, list[float]]:
+        """Returnerar {texthash: vektor} för de hashar som finns i cachen."""
+        rows = self._lookup(text_hashes)
+        self.hits += sum(h in rows for h in text_hashes)
+        self.misses += sum(h not in rows for h in text_hashes)
+        if not rows:
+            return {}
+        hashes = list(rows)
+        vectors = self._read_rows([rows[h] for h in hashes])
+        return {h: vector.tolist() for h, vector in zip(hashes, vectors)}
+
+    def put(self, text_hashes: list[str], vectors):
+        """Sparar vektorer för hashar som inte redan finns i cachen."""
+        new = {}
+        known = self._lookup(text_hashes)
+        for text_hash, vector in zip(text_hashes, vectors):
+            if text_hash not in known:
+                new.setdefault(text_hash, vector)
+        if not new:
+            return
+        matrix = np.asarray(list(new.values()), dtype=np.float16)
+        if self.dim is None:
+            self.dim = matrix.shape[1]
+            with self._conn:
+                self._conn.execute("INSERT INTO meta (key, value) VALUES ('dim', ?)", (str(self.dim),))
+        elif matrix.shape[1] != self.dim:
+            raise ValueError(f"Fel dimension {matrix.shape[1]} (cachen har {self.dim})")
+
+        size = self.vectors_path.stat().st_size if self.vectors_path.exists() else 0
+        first_row = size // (2 * self.dim)
+        with open(self.vectors_path, "ab") as f:
+            # Skriv efter sista hela raden (tar bort en halvskriven rad från ett avbrott)
+            f.truncate(first_row * 2 * self.dim)
+            f.write(matrix.tobytes())
+        with self._conn:
+            self._conn.executemany(
+                "INSERT INTO entries (text_hash, row) VALUES (?, ?)",
+                [(h, first_row + i) for i, h in enumerate(new)],
+            )
+        self._rows += len(new)
+
+    def take_stats(self) -> tuple[int, int]:
+        """Returnerar (träffar, missar) sedan förra anropet och nollställer räknarna."""
+        stats = (self.hits, self.misses)
+        self.hits = self.misses = 0
+        return stats
+
+    def close(self):
+        self._matrix = None
+        self._conn.close()
@@ -0,0 +1,69 @@
+"""
+Checkpoint och dead letter-fil för embedding-steget.
+
+Checkpointen skrivs (atomiskt) efter varje batch som är skriven till
+vektordatabasen och visar hur långt en avbruten körning kom. Själva
+återupptagandet sker via inläsningsmanifestet: sidor som redan är skrivna
+hoppas över direkt, utan att läsa Chromas metadata. Checkpointen anger också
+om körningen är en full ombyggnad, så att en omstart av en avbruten
+ombyggnad fortsätter i stället för att radera databasen igen.
+
+Dead letter-filen (JSONL) listar chunks som inte gick att embedda eller
+skriva ens vid ett nytt försök med mindre batchar. Deras sidor registreras
+aldrig i manifestet och tas därför med igen i nästa körning.
+"""
+
+import json
+import os
+import time
+from pathlib import Path
+
+
+def write_checkpoint(path: Path, batch_number: int, chunks_written: int, page: tuple | None,
+                     rebuild: bool = False):
+    """Sparar senast skrivna batch (och sida) via en temporär fil och os.replace."""
+    path = Path(path)
+    checkpoint = {
+        "batch": batch_number,
+        "chunks_written": chunks_written,
+        "full_path": page[0] if page else None,
+        "page": page[1] if page else None,
+        "rebuild": rebuild,
+        "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+    }
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def read_checkpoint(path: Path) -> dict | None:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def is_interrupted_rebuild(checkpoint: dict | None) -> bool:
+    """Sant om checkpointen lämnades av en full ombyggnad som inte blev klar."""
+    return bool(checkpoint and checkpoint.get("rebuild"))
+
+
+def write_dead_letters(path: Path, failures: list[tuple]):
+    """Skriver [(chunk, felmeddelande), ...] som en rad per chunk-ID."""
+    with open(path, "w", encoding="utf-8") as f:
+        for chunk, error in failures:
+            f.write(json.dumps({
+                "id": chunk.id,
+                "full_path": chunk.metadata.get("full_path"),
+                "page": chunk.metadata.get("page"),
+                "error": error,
+            }, ensure_ascii=False) + "\n")
+
+
+def read_dead_letters(path: Path) -> list[dict]:
+    if not Path(path).exists():
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
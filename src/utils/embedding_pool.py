@@ -0,0 +1,67 @@
+"""
+Embedding i en pool av workers (processer eller en tråd).
+
+På en CPU-maskin utan GPU körs flera processer med ett fast antal trådar
+var, i stället för en process vars intra-op-trådar inte räcker till för att
+fylla alla kärnor. Processerna startas med spawn: ingenting delas med
+huvudprocessen, utan varje worker importerar om modulerna (huvudskriptet
+och därmed torch) och laddar sin egen kopia av modellen i initializern.
+Med GPU körs en enda tråd i huvudprocessen. Resultaten samlas i
+huvudprocessen, som ensam skriver till databasen.
+"""
+
+import os
+
+from src.utils.embedding_batching import embed_in_batches, token_counter
+
+_WORKER = {}
+
+THREAD_ENV_VARS = ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS")
+
+
+def pin_worker_threads(threads: int):
+    """
+    Sätter trådvariablerna i miljön som workers ärver. De läses när torch
+    (OpenMP/MKL) laddas, och en spawn-worker importerar torch redan när
+    huvudskriptet importeras om, före initializern. Anropas därför i
+    huvudprocessen innan poolen startas.
+    """
+    for name in THREAD_ENV_VARS:
+        os.environ[name] = str(threads)
+    os.environ["TOKENIZERS_PARALLELISM"] = "false"
+
+
+def init_embedding_worker(threads: int | None, backend: str, model_name: str, device: str,
+                          encode_kwargs: dict, batching: dict):
+    """
+    Initializer för poolens workers: låser antalet trådar och laddar modellen.
+    batching skickas vidare till embed_in_batches (strategy, max_tokens, ...).
+    """
+    if threads:
+        # Miljön är redan satt av pin_worker_threads; torch är då redan importerat
+        # i workern, så trådantalet låses även via torch:s egna API
+        pin_worker_threads(threads)
+        import torch
+        torch.set_num_threads(threads)
+        torch.set_num_interop_threads(1)
+
+    from transformers import AutoTokenizer
+    from src.utils.embedding_backends import load_embeddings
+
+    _WORKER["model"] = load_embeddings(backend, model_name=model_name, device=device,
+                                       encode_kwargs=encode_kwargs, num_threads=threads)
+    _WORKER["count_tokens"] = token_counter(AutoTokenizer.from_pretrained(model_name))
+    _WORKER["batching"] = batching
+
+
+def embed_chunks(chunks: list) -> list:
+    """Körs i workern: embeddar en batch Documents och returnerar vektorerna i samma ordning."""
+    if not chunks:
+        # Hela batchen fanns i embedding-cachen
+        return []
+    return embed_in_batches(
+        _WORKER["model"].embed_documents,
+        [chunk.page_content for chunk in chunks],
+        count_tokens=_WORKER["count_tokens"],
+        **_WORKER["batching"],
+    )
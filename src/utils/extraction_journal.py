@@ -0,0 +1,147 @@
+"""
+Append-only journal över textextraheringen (steg 03).
+
+Varje försök sparas som en JSON-rad med status, tidsåtgång, sidantal och
+motor. Vid en ny körning avgör journalen vilka filer som ska köras om:
+klara och permanent misslyckade filer hoppas över, medan tillfälliga fel
+(timeout, undantag) försöks igen med exponentiell backoff upp till
+max_attempts gånger i rad. Delvis extraherade filer (t.ex. en mixed-PDF
+utan OCR) sparas men körs om när motorn ändras.
+
+Lyckade försök sparar även källfilens fingeravtryck (storlek, mtime_ns,
+sha256), så att filer som ersatts på plats kan upptäckas och extraheras om.
+"""
+
+import json
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Status för rader som bara uppdaterar en fils fingeravtryck (inget extraheringsförsök)
+FINGERPRINT_STATUS = "fingerprint"
+
+# Statusar som räknas som tillfälliga fel ("timeout", "error: ...", "error_saving: ...")
+TRANSIENT_PREFIXES = ("timeout", "error")
+
+# Statusar för dokument som sparats utan alla sidor ("partial_no_ocr")
+PARTIAL_PREFIX = "partial"
+
+MAX_ATTEMPTS = 4
+BACKOFF_BASE_SECONDS = 3600
+
+
+def is_success(status: str) -> bool:
+    return status.startswith("success")
+
+
+def is_transient(status: str) -> bool:
+    return status.startswith(TRANSIENT_PREFIXES)
+
+
+def is_partial(status: str | None) -> bool:
+    return status is not None and status.startswith(PARTIAL_PREFIX)
+
+
+class ExtractionJournal:
+    """JSONL-journal med senaste status per fil. Används som context manager."""
+
+    def __init__(self, journal_path: Path, max_attempts: int = MAX_ATTEMPTS,
+                 backoff_seconds: float = BACKOFF_BASE_SECONDS):
+        self.journal_path = Path(journal_path)
+        self.max_attempts = max_attempts
+        self.backoff_seconds = backoff_seconds
+        self._last = {}
+        self._failures = {}  # Antal tillfälliga fel i rad per fil
+        self._sources = {}   # Senast kända fingeravtryck per fil
+
+        if self.journal_path.exists():
+            with open(self.journal_path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # Halvskriven rad från en avbruten körning
+                    self._remember(entry)
+
+        self.journal_path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.journal_path, "a", encoding="utf-8")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def __len__(self):
+        return len(self._last)
+
+    def _remember(self, entry: dict):
+        key = entry["full_path"]
+        if entry.get("source"):
+            self._sources[key] = entry["source"]
+        if entry["status"] == FINGERPRINT_STATUS:
+            return
+        self._last[key] = entry
+        self._failures[key] = self._failures.get(key, 0) + 1 if is_transient(entry["status"]) else 0
+
+    def _write(self, entry: dict):
+        self._remember(entry)
+        self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    def record(self, path: Path, status: str, seconds: float | None = None,
+               pages: int | None = None, engine: str | None = None, source: dict | None = None):
+        """Lägger till en rad i journalen och skriver den direkt till disk."""
+        self._write({
+            "time": datetime.now().isoformat(timespec="seconds"),
+            "filename": Path(path).name, "full_path": str(path), "status": status,
+            "seconds": None if seconds is None else round(seconds, 2),
+            "pages": pages, "engine": engine, "source": source,
+        })
+
+    def record_source(self, path: Path, source: dict):
+        """Sparar ett nytt fingeravtryck för filen utan att räknas som ett försök."""
+        self._write({
+            "time": datetime.now().isoformat(timespec="seconds"),
+            "filename": Path(path).name, "full_path": str(path),
+            "status": FINGERPRINT_STATUS, "source": source,
+        })
+
+    def source(self, path: Path) -> dict | None:
+        """Senast kända fingeravtryck {"size", "mtime_ns", "sha256"} för filen, eller None."""
+        return self._sources.get(str(path))
+
+    def status(self, path: Path) -> str | None:
+        """Status för filens senaste försök, eller None om den inte har körts."""
+        entry = self._last.get(str(path))
+        return entry["status"] if entry else None
+
+    def skip_reason(self, path: Path, engine: str | None = None, now: datetime | None = None) -> str | None:
+        """
+        Returnerar varför filen ska hoppas över ("done", "partial", "failed",
+        "backoff"), eller None om den ska köras.
+
+        En delvis extraherad eller permanent misslyckad fil körs om ifall
+        motorn har ändrats sedan försöket (t.ex. när Tesseract har installerats).
+        """
+        entry = self._last.get(str(path))
+        if entry is None:
+            return None
+        status = entry["status"]
+        if is_success(status):
+            return "done"
+        if is_partial(status):
+            return "partial" if entry.get("engine") == engine else None
+        if not is_transient(status):
+            return "failed" if entry.get("engine") == engine else None
+
+        failures = self._failures[str(path)]
+        if failures >= self.max_attempts:
+            return "failed"
+        now = now or datetime.now()
+        wait = timedelta(seconds=self.backoff_seconds * 2 ** (failures - 1))
+        if now - datetime.fromisoformat(entry["time"]) < wait:
+            return "backoff"
+        return None
+
+    def close(self):
+        self._file.close()
@@ -0,0 +1,93 @@
+"""
+Persistent manifest med fingeravtryck för filerna i rådatamappen.
+
+Sparar (sökväg, storlek, mtime_ns, snabbhash, sha256) i en SQLite-databas
+under PROCESSED_DIR. En lagrad hash återanvänds så länge filens storlek och
+mtime är oförändrade, så en omkörning över en oförändrad korpus behöver
+inte läsa om några filer alls.
+"""
+
+import sqlite3
+from pathlib import Path
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path        TEXT PRIMARY KEY,
+    size        INTEGER NOT NULL,
+    mtime_ns    INTEGER NOT NULL,
+    quick_hash  TEXT,
+    sha256      TEXT
+)
+"""
+
+
+class FileManifest:
+    """Fingeravtrycksmanifest lagrat i SQLite. Används som context manager."""
+
+    def __init__(self, db_path: Path, base_dir: Path):
+        self.db_path = Path(db_path)
+        self.base_dir = Path(base_dir)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.db_path)
+        self._conn.execute(_SCHEMA)
+        self._rows = {
+            row[0]: row[1:]
+            for row in self._conn.execute("SELECT path, size, mtime_ns, quick_hash, sha256 FROM files")
+        }
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def __len__(self):
+        return len(self._rows)
+
+    def _key(self, path: Path) -> str:
+        """Sökvägen relativt base_dir (så att projektet kan flyttas mellan datorer)."""
+        try:
+            return Path(path).relative_to(self.base_dir).as_posix()
+        except ValueError:
+            return str(path)
+
+    def get(self, path: Path, size: int, mtime_ns: int) -> tuple[str | None, str | None]:
+        """
+        Returnerar (snabbhash, sha256) för filen om fingeravtrycket är oförändrat.
+        Saknade eller inaktuella värden returneras som None.
+        """
+        row = self._rows.get(self._key(path))
+        if row is None or row[0] != size or row[1] != mtime_ns:
+            return None, None
+        return row[2], row[3]
+
+    def put(self, path: Path, size: int, mtime_ns: int, quick_hash: str | None = None, sha256: str | None = None):
+        """Sparar fingeravtryck och hashar. Befintliga hashar behålls om fingeravtrycket är oförändrat."""
+        key = self._key(path)
+        old_quick, old_sha = self.get(path, size, mtime_ns)
+        row = (size, mtime_ns, quick_hash or old_quick, sha256 or old_sha)
+        self._rows[key] = row
+        self._conn.execute(
+            "INSERT OR REPLACE INTO files (path, size, mtime_ns, quick_hash, sha256) VALUES (?, ?, ?, ?, ?)",
+            (key, *row),
+        )
+
+    def remove(self, paths):
+        """Tar bort filer (t.ex. raderade dubbletter) ur manifestet."""
+        keys = [self._key(p) for p in paths]
+        for key in keys:
+            self._rows.pop(key, None)
+        self._conn.executemany("DELETE FROM files WHERE path = ?", [(k,) for k in keys])
+
+    def prune(self, existing_paths) -> int:
+        """Tar bort rader för filer som inte längre finns. Returnerar antal borttagna rader."""
+        keep = {self._key(p) for p in existing_paths}
+        stale = [key for key in self._rows if key not in keep]
+        for key in stale:
+            del self._rows[key]
+        self._conn.executemany("DELETE FROM files WHERE path = ?", [(k,) for k in stale])
+        return len(stale)
+
+    def close(self):
+        self._conn.commit()
+        self._conn.close()
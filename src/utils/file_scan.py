@@ -0,0 +1,127 @@
+"""
+Genomsökning av en mappstruktur i ett enda pass.
+
+Använder os.scandir så att varje katalogpost bara stat:as en gång
+(DirEntry cachar stat-resultatet). Resultatet är en inventering som
+alla förberedelsesteg delar istället för att själva köra rglob/stat:
+filer per filändelse, storlekar, ZIP-filer, ej stödda filer och tomma mappar.
+"""
+
+import os
+from pathlib import Path
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+
+NO_EXTENSION = "<ingen filändelse>"
+
+
+@dataclass(frozen=True)
+class FileEntry:
+    """En fil med cachad storlek och ändringstid."""
+    path: Path
+    size: int
+    mtime_ns: int
+
+    @property
+    def extension(self) -> str:
+        return self.path.suffix.lower()
+
+
+@dataclass
+class TreeInventory:
+    """
+    Inventering av en mappstruktur.
+
+    Steg som raderar eller flyttar filer rapporterar det via discard(),
+    så att inventeringen hålls aktuell utan att mappen gås igenom igen.
+    """
+    root: Path
+    entries: list[FileEntry] = field(default_factory=list)
+    dirs: list[Path] = field(default_factory=list)
+    # Antal direkta poster (filer, mappar, övrigt) per mapp
+    child_counts: dict[Path, int] = field(default_factory=dict)
+    _removed: set[Path] = field(default_factory=set, repr=False)
+
+    @property
+    def files(self) -> list[FileEntry]:
+        """Alla filer som finns kvar (ej raderade/flyttade)."""
+        return [e for e in self.entries if e.path not in self._removed]
+
+    @property
+    def by_extension(self) -> dict[str, list[FileEntry]]:
+        grouped = defaultdict(list)
+        for entry in self.files:
+            grouped[entry.extension or NO_EXTENSION].append(entry)
+        return dict(grouped)
+
+    @property
+    def extension_counts(self) -> Counter:
+        return Counter({ext: len(files) for ext, files in self.by_extension.items()})
+
+    @property
+    def total_size(self) -> int:
+        return sum(e.size for e in self.files)
+
+    @property
+    def zips(self) -> list[FileEntry]:
+        return self.by_extension.get('.zip', [])
+
+    def with_extensions(self, extensions) -> list[FileEntry]:
+        """Filer vars (gemena) filändelse finns i extensions."""
+        extensions = {ext.lower() for ext in extensions}
+        return [e for e in self.files if e.extension in extensions]
+
+    @property
+    def empty_dirs(self) -> list[Path]:
+        """Mappar (ej roten) utan några poster, djupaste först."""
+        return [d for d in sorted(self.dirs, reverse=True) if self.child_counts.get(d) == 0]
+
+    def discard(self, path: Path):
+        """Markerar en fil eller mapp som borttagen."""
+        path = Path(path)
+        if path in self._removed:
+            return
+        self._removed.add(path)
+        parent = path.parent
+        if parent in self.child_counts:
+            self.child_counts[parent] -= 1
+
+    def is_removed(self, path: Path) -> bool:
+        return Path(path) in self._removed
+
+
+def scan_tree(root: Path) -> TreeInventory:
+    """Går igenom root rekursivt med os.scandir och returnerar en TreeInventory."""
+    root = Path(root)
+    inventory = TreeInventory(root=root)
+    stack = [root]
+
+    # Mapparna gås igenom i pre-order i katalogordning, precis som rglob, så
+    # att filerna kommer i samma ordning som förut (find_duplicates behåller
+    # den första filen i ordningen och raderar resten)
+    while stack:
+        current = stack.pop()
+        count = 0
+        subdirs = []
+        try:
+            with os.scandir(current) as it:
+                for entry in it:
+                    count += 1
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            sub = Path(entry.path)
+                            inventory.dirs.append(sub)
+                            subdirs.append(sub)
+                        elif entry.is_file():
+                            st = entry.stat()
+                            inventory.entries.append(FileEntry(Path(entry.path), st.st_size, st.st_mtime_ns))
+                    except OSError:
+                        continue
+        except OSError:
+            # Oläsbar mapp – räknas aldrig som tom
+            continue
+        inventory.child_counts[current] = count
+        # Omvänd ordning på stacken så att första undermappen gås igenom först
+        stack.extend(reversed(subdirs))
+
+    return inventory
@@ -0,0 +1,79 @@
+"""
+Manifest över sidor som redan finns i vektordatabasen.
+
+Sparar (full_path, sida, texthash) i en liten SQLite-databas bredvid
+Chroma-databasen. Den inkrementella embeddingen läser manifestet i stället
+för att bläddra igenom hela samlingens metadata med offset, vilket blir
+långsammare ju större databasen är.
+
+Nyckeln är full_path (relativ sökväg) och inte filnamnet, eftersom samma
+filnamn (t.ex. beslut.pdf) förekommer i många mappar.
+"""
+
+import sqlite3
+from pathlib import Path
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    full_path   TEXT NOT NULL,
+    page        INTEGER NOT NULL,
+    text_hash   TEXT,
+    PRIMARY KEY (full_path, page)
+) WITHOUT ROWID
+"""
+
+
+class IngestManifest:
+    """Sidor som är inlästa i vektordatabasen. Används som context manager."""
+
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        # Skrivs från embeddingens skrivartråd medan huvudtråden läser (contains läser bara minnet)
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute(_SCHEMA)
+        self._pages = {
+            (full_path, page): text_hash
+            for full_path, page, text_hash in self._conn.execute("SELECT full_path, page, text_hash FROM pages")
+        }
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def __len__(self):
+        return len(self._pages)
+
+    def contains(self, full_path: str, page: int, text_hash: str) -> bool:
+        """
+        Sant om sidan redan är inläst med samma text. Sidor från en äldre
+        databas (utan känd hash, se add) räknas som inlästa.
+        """
+        key = (full_path, page)
+        return key in self._pages and self._pages[key] in (None, text_hash)
+
+    def stored_hash(self, full_path: str, page: int) -> str | None:
+        """Texthashen sidan lästes in med, eller None om den är okänd eller sidan saknas."""
+        return self._pages.get((full_path, page))
+
+    def add(self, pages):
+        """Registrerar sidor [(full_path, sida, texthash), ...] i en transaktion."""
+        pages = list(pages)
+        with self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO pages (full_path, page, text_hash) VALUES (?, ?, ?)", pages
+            )
+        for full_path, page, text_hash in pages:
+            self._pages[(full_path, page)] = text_hash
+
+    def remove(self, full_paths):
+        """Tar bort alla sidor för dokumenten (t.ex. filer som ersatts på plats)."""
+        full_paths = set(full_paths)
+        with self._conn:
+            self._conn.executemany("DELETE FROM pages WHERE full_path = ?", [(p,) for p in full_paths])
+        self._pages = {key: h for key, h in self._pages.items() if key[0] not in full_paths}
+
+    def close(self):
+        self._conn.close()
@@ -0,0 +1,57 @@
+"""
+Innehållsadresserad cache för OCR-resultat.
+
+Nyckeln är en hash av den renderade sidbilden plus OCR-parametrarna
+(språk, DPI), så en skannad PDF som flyttas, byter namn eller levereras
+igen i en ny omgång behöver inte OCR:as om. Varje sida lagras som en egen
+textfil, vilket gör att flera worker-processer kan läsa och skriva
+samtidigt utan lås.
+"""
+
+import hashlib
+import os
+from pathlib import Path
+
+
+def cache_key(image_bytes: bytes, *params) -> str:
+    """sha256 av sidbildens bytes och OCR-parametrarna."""
+    h = hashlib.sha256()
+    h.update("|".join(str(p) for p in params).encode("utf-8"))
+    h.update(b"\0")
+    h.update(image_bytes)
+    return h.hexdigest()
+
+
+class OcrCache:
+    """OCR-text per sida lagrad som <cache_dir>/<2 tecken>/<nyckel>.txt. Räknar träffar och missar."""
+
+    def __init__(self, cache_dir: Path):
+        self.cache_dir = Path(cache_dir)
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.txt"
+
+    def get(self, key: str) -> str | None:
+        try:
+            text = self._path(key).read_text(encoding="utf-8")
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return text
+
+    def put(self, key: str, text: str):
+        """Skriver atomärt (temporär fil + os.replace) så att en avbruten körning inte lämnar halva poster."""
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_text(text, encoding="utf-8")
+        os.replace(tmp, path)
+
+    def take_stats(self) -> tuple[int, int]:
+        """Returnerar (träffar, missar) sedan förra anropet och nollställer räknarna."""
+        stats = (self.hits, self.misses)
+        self.hits = self.misses = 0
+        return stats
@@ -0,0 +1,296 @@
+"""
+Hjälpfunktioner för parallell bearbetning i pipelinens steg.
+"""
+
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+import psutil
+
+
+class TaskTimeout(Exception):
+    """En uppgift tog längre tid än sin tidsbudget."""
+
+
+def bounded_map(executor, func, items, max_in_flight: int):
+    """
+    Som executor.map, men med högst max_in_flight uppgifter inskickade åt gången
+    och resultaten i den ordning de blir klara.
+
+    Ger (item, future) för varje avslutad uppgift, så att anroparen kan
+    hantera resultat och undantag löpande.
+    """
+    items = iter(items)
+    in_flight = {}
+
+    def _fill():
+        while len(in_flight) < max_in_flight:
+            try:
+                item = next(items)
+            except StopIteration:
+                return
+            in_flight[executor.submit(func, item)] = item
+
+    _fill()
+    while in_flight:
+        done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+        for future in done:
+            yield in_flight.pop(future), future
+        _fill()
+
+
+def ordered_map(executor, func, items, max_in_flight: int):
+    """
+    Som bounded_map, men resultaten ges i samma ordning som items
+    (t.ex. när en ensam skrivare måste ta emot batcharna i ordning).
+
+    Ger (item, future) för varje uppgift; future är avslutad när den ges.
+    """
+    items = iter(items)
+    in_flight = deque()
+    for item in items:
+        in_flight.append((item, executor.submit(func, item)))
+        if len(in_flight) >= max_in_flight:
+            item, future = in_flight.popleft()
+            wait([future])
+            yield item, future
+    while in_flight:
+        item, future = in_flight.popleft()
+        wait([future])
+        yield item, future
+
+
+_START_QUEUE = None
+
+
+def _init_start_reporting(start_queue):
+    """Initializer för poolens workers: kön som starttider rapporteras till."""
+    global _START_QUEUE
+    _START_QUEUE = start_queue
+
+
+def _call_and_measure_rss(func, item, task_id=None):
+    """
+    Körs i workern: rapporterar (task_id, pid, starttid) när uppgiften faktiskt
+    börjar köras, anropar func och rapporterar workerns RSS (MB) efteråt.
+    """
+    if task_id is not None and _START_QUEUE is not None:
+        _START_QUEUE.put((task_id, os.getpid(), time.monotonic()))
+    result = func(item)
+    return result, psutil.Process().memory_info().rss / 2**20
+
+
+def _kill_process_tree(pid: int):
+    """Dödar en worker inklusive dess barnprocesser (t.ex. tesseract, pdftoppm)."""
+    try:
+        worker = psutil.Process(pid)
+        for child in worker.children(recursive=True):
+            child.kill()
+        worker.kill()
+    except psutil.NoSuchProcess:
+        pass
+
+
+def recycling_map(func, items, max_workers: int, max_in_flight: int | None = None,
+                  max_tasks_per_child: int | None = None, max_rss_mb: float | None = None,
+                  timeout_for=None, poll_seconds: float = 1.0):
+    """
+    Som bounded_map, men med en egen ProcessPoolExecutor vars workers byts ut:
+      - efter max_tasks_per_child uppgifter per worker
+      - när en worker rapporterar en RSS över max_rss_mb; då skickas inget nytt
+        in förrän pågående uppgifter är klara, och poolen startas sedan om
+      - när en uppgift överskrider sin tidsbudget timeout_for(item) (sekunder,
+        eller None för ingen gräns); då får uppgiften TaskTimeout direkt,
+        inget nytt skickas in och uppgifter som inte har börjat köras
+        avbryts. När alla uppgifter som redan körs är klara dödas workern
+        som hängde sig och poolen startas om (ProcessPoolExecutor avslutar
+        alla workers när en av dem dör). Bara uppgifter som aldrig började
+        köras skickas in igen, så inget färdigt arbete går förlorat.
+
+    Tidsbudgeten räknas från att en worker faktiskt börjar köra uppgiften
+    (workern rapporterar starttiden), inte från att den hamnar i poolens kö.
+
+    Ger (item, future) i den ordning uppgifterna blir klara. Varje future är
+    redan avslutad och innehåller func:s resultat eller undantag.
+    """
+    items = iter(items)
+    max_in_flight = max_in_flight or 2 * max_workers
+    requeued = deque()  # Uppgifter som avbröts när poolen dödades
+    exhausted = False
+
+    def _next_item():
+        nonlocal exhausted
+        if requeued:
+            return requeued.popleft()
+        try:
+            return next(items)
+        except StopIteration:
+            exhausted = True
+            raise
+
+    # Samma kontext som ProcessPoolExecutor själv väljer, så att kön kan delas med workers
+    context = multiprocessing.get_context("spawn" if max_tasks_per_child else None)
+    task_ids = iter(range(2**62))
+
+    while not exhausted or requeued:
+        restart = False
+        draining = False  # En uppgift har överskridit sin budget; poolen töms innan den startas om
+        in_flight = {}
+        started = {}  # future -> (pid, starttid)
+        timed_out = set()  # Rapporterade som TaskTimeout men workern kör fortfarande
+        # En ny kö per pool: en worker som dödas mitt i en skrivning kan lämna kön trasig
+        start_queue = context.Queue() if timeout_for else None
+        future_ids = {}
+        executor = ProcessPoolExecutor(
+            max_workers=max_workers, mp_context=context, max_tasks_per_child=max_tasks_per_child,
+            initializer=_init_start_reporting, initargs=(start_queue,),
+        )
+        try:
+            while True:
+                while (not restart and not draining and len(in_flight) < max_in_flight
+                       and (requeued or not exhausted)):
+                    try:
+                        item = _next_item()
+                    except StopIteration:
+                        break
+                    task_id = next(task_ids) if timeout_for else None
+                    future = executor.submit(_call_and_measure_rss, func, item, task_id)
+                    in_flight[future] = item
+                    future_ids[task_id] = future
+                if not in_flight:
+                    break
+
+                done, _ = wait(in_flight, timeout=poll_seconds if timeout_for else None,
+                               return_when=FIRST_COMPLETED)
+                for future in done:
+                    item = in_flight.pop(future)
+                    started.pop(future, None)
+                    if future in timed_out:
+                        # Blev klar efter sin budget; TaskTimeout är redan rapporterad
+                        timed_out.discard(future)
+                        continue
+                    finished = Future()
+                    try:
+                        result, rss_mb = future.result()
+                    except Exception as e:
+                        finished.set_exception(e)
+                    else:
+                        finished.set_result(result)
+                        if max_rss_mb and rss_mb > max_rss_mb:
+                            restart = True
+                    yield item, finished
+
+                if not timeout_for:
+                    continue
+
+                # Klockan startar när workern rapporterar att den börjat köra uppgiften
+                while True:
+                    try:
+                        task_id, pid, start = start_queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    future = future_ids.pop(task_id)
+                    if future in in_flight:
+                        started[future] = (pid, start)
+                now = time.monotonic()
+                for future, item in list(in_flight.items()):
+                    if future in timed_out or future not in started:
+                        continue
+                    budget = timeout_for(item)
+                    if budget and now - started[future][1] > budget:
+                        timed_out.add(future)
+                        finished = Future()
+                        finished.set_exception(TaskTimeout(f"överskred {budget:.0f} s"))
+                        yield item, finished
+                        if not draining:
+                            # Uppgifter som inte har börjat körs i nästa pool i stället
+                            draining = True
+                            for waiting in [f for f in in_flight if f not in started]:
+                                if waiting.cancel():
+                                    requeued.append(in_flight.pop(waiting))
+
+                if not draining:
+                    continue
+                running = [f for f in in_flight if f not in timed_out and f in started]
+                if running:
+                    continue
+                hung = [f for f in in_flight if f in timed_out]
+                if not hung:
+                    # De hängda uppgifterna blev klara av sig själva; poolen är hel
+                    draining = False
+                    continue
+                for future in hung:
+                    _kill_process_tree(started[future][0])
+                # Kvar är bara uppgifter som aldrig började köras
+                requeued.extend(item for future, item in in_flight.items() if future not in timed_out)
+                in_flight.clear()
+                restart = True
+                break
+        finally:
+            # Avbryts generatorn i förtid ska köade uppgifter inte köras
+            executor.shutdown(wait=True, cancel_futures=True)
+
+
+class BackgroundWriter:
+    """
+    Kör write(*args) i en egen tråd för varje submit, i samma ordning.
+
+    Kön är begränsad till max_queued väntande anrop, så att producenten
+    (t.ex. embedding-modellen) aldrig ligger mer än så före skrivaren.
+    Ett undantag i write kastas vidare vid nästa submit eller vid close.
+    Används som context manager.
+    """
+
+    _DONE = object()
+
+    def __init__(self, write, max_queued: int = 2):
+        self._write = write
+        self._queue = queue.Queue(maxsize=max_queued)
+        self._error = None
+        self._thread = threading.Thread(target=self._run, name="background-writer", daemon=True)
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _run(self):
+        while True:
+            args = self._queue.get()
+            if args is self._DONE:
+                return
+            if self._error is None:
+                try:
+                    self._write(*args)
+                except BaseException as e:
+                    self._error = e
+            self._queue.task_done()
+
+    def _raise_error(self):
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    def submit(self, *args):
+        """Köar ett anrop till write. Blockerar när kön är full."""
+        self._raise_error()
+        self._queue.put(args)
+
+    def flush(self):
+        """Väntar tills alla köade anrop är skrivna, utan att stänga skrivaren."""
+        self._queue.join()
+        self._raise_error()
+
+    def close(self):
+        """Väntar tills alla köade anrop är skrivna och stänger skrivaren."""
+        if self._thread.is_alive():
+            self._queue.put(self._DONE)
+            self._thread.join()
+        self._raise_error()
@@ -26,11 +26,25 @@ PROCESSED_DIR = DATA_DIR / "02_processed"
 # ============================================================
 ANALYSIS_REPORT_FILE = PROCESSED_DIR / "pdf_analysis_report.csv"
 EXTRACTED_TEXT_DIR = PROCESSED_DIR / "extracted_text"
+TEXT_STORE_FILE = PROCESSED_DIR / "extracted_text.sqlite"
+EXTRACTION_LOG_FILE = PROCESSED_DIR / "text_extraction_log.jsonl"
+STALE_DOCUMENTS_FILE = PROCESSED_DIR / "stale_documents.jsonl"
+FILE_MANIFEST_FILE = PROCESSED_DIR / "file_manifest.sqlite"
+OCR_CACHE_DIR = PROCESSED_DIR / "ocr_cache"
+EMBEDDING_CACHE_DIR = PROCESSED_DIR / "embedding_cache"
 
 # ============================================================
 # VEKTOR-DATABAS
 # ============================================================
 VECTOR_DB_DIR = PROJECT_ROOT / "vector_db_bgem3"
+INGEST_MANIFEST_FILE = VECTOR_DB_DIR / "ingest_manifest.sqlite"
+EMBEDDING_CHECKPOINT_FILE = VECTOR_DB_DIR / "embedding_checkpoint.json"
+EMBEDDING_DEAD_LETTER_FILE = VECTOR_DB_DIR / "embedding_dead_letter.jsonl"
+
+# ============================================================
+# EXPORTERADE MODELLER (ONNX-backend för embeddings)
+# ============================================================
+ONNX_MODEL_DIR = PROJECT_ROOT / "models" / "bge_m3_onnx_int8"
 
 # ============================================================
 # ZIP-FIL FÖR COLAB-UPPLADDNING
@@ -56,7 +70,17 @@ def print_paths():
     print(f"  Bearbetad data:    {PROCESSED_DIR}")
     print(f"  Analysrapport:     {ANALYSIS_REPORT_FILE}")
     print(f"  Extraherad text:   {EXTRACTED_TEXT_DIR}")
+    print(f"  Textlagring:       {TEXT_STORE_FILE}")
+    print(f"  Extraheringslogg:  {EXTRACTION_LOG_FILE}")
+    print(f"  Inaktuella dok.:   {STALE_DOCUMENTS_FILE}")
+    print(f"  Filmanifest:       {FILE_MANIFEST_FILE}")
+    print(f"  OCR-cache:         {OCR_CACHE_DIR}")
+    print(f"  Embedding-cache:   {EMBEDDING_CACHE_DIR}")
     print(f"  Vektordatabas:     {VECTOR_DB_DIR}")
+    print(f"  Manifest (vektor): {INGEST_MANIFEST_FILE}")
+    print(f"  Checkpoint:        {EMBEDDING_CHECKPOINT_FILE}")
+    print(f"  Dead letters:      {EMBEDDING_DEAD_LETTER_FILE}")
+    print(f"  ONNX-modell:       {ONNX_MODEL_DIR}")
     print(f"  ZIP för Colab:     {ZIP_OUTPUT_FILE}")
     print("=" * 60)
 
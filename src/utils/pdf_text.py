@@ -0,0 +1,130 @@
+"""
+Gemensam textextrahering för PDF-filer (används av steg 02 och 03).
+
+Två motorer finns:
+  - "pdfium"     – pypdfium2, snabb (standard)
+  - "pdfplumber" – beräknar layout för varje tecken, betydligt långsammare
+
+Med pdfium som motor används pdfplumber som reserv för sidor där pdfium
+inte hittar någon text.
+"""
+
+from pathlib import Path
+
+import pdfplumber
+import pypdfium2 as pdfium
+
+PDF_ENGINES = ("pdfium", "pdfplumber")
+DEFAULT_PDF_ENGINE = "pdfium"
+
+# En sida med fler tecken än så här räknas som textbaserad, annars behöver den OCR
+MIN_TEXT_CHARS_PER_PAGE = 50
+
+
+def _check_engine(engine: str):
+    if engine not in PDF_ENGINES:
+        raise ValueError(f"Okänd PDF-motor: {engine} (välj bland {', '.join(PDF_ENGINES)})")
+
+
+def _pdfium_page_text(pdf, index: int) -> str:
+    page = pdf[index]
+    try:
+        textpage = page.get_textpage()
+        try:
+            text = textpage.get_text_range()
+        finally:
+            textpage.close()
+    finally:
+        page.close()
+    return text.replace("\r\n", "\n").replace("\r", "\n")
+
+
+def _pdfplumber_texts(file_path: Path, indices: list[int]) -> dict[int, str]:
+    texts = {}
+    with pdfplumber.open(file_path) as pdf:
+        for i in indices:
+            texts[i] = pdf.pages[i].extract_text() or ""
+    return texts
+
+
+def count_pages(file_path: Path, engine: str = DEFAULT_PDF_ENGINE) -> int:
+    """Antal sidor i en PDF."""
+    _check_engine(engine)
+    if engine == "pdfium":
+        pdf = pdfium.PdfDocument(str(file_path))
+        try:
+            return len(pdf)
+        finally:
+            pdf.close()
+    with pdfplumber.open(file_path) as pdf:
+        return len(pdf.pages)
+
+
+def extract_page_texts(file_path: Path, engine: str = DEFAULT_PDF_ENGINE,
+                       page_numbers: list[int] | None = None, fallback: bool = True) -> dict[int, str]:
+    """
+    Extraherar text per sida. Returnerar {sidnummer (1-baserat): text},
+    även för sidor utan text (tom sträng).
+
+    page_numbers begränsar extraheringen till vissa sidor (1-baserade).
+    fallback=False stänger av pdfplumber-reserven för tomma pdfium-sidor.
+    """
+    _check_engine(engine)
+
+    if engine == "pdfplumber":
+        with pdfplumber.open(file_path) as pdf:
+            indices = range(len(pdf.pages)) if page_numbers is None else [n - 1 for n in page_numbers]
+            return {i + 1: pdf.pages[i].extract_text() or "" for i in indices}
+
+    pdf = pdfium.PdfDocument(str(file_path))
+    try:
+        indices = range(len(pdf)) if page_numbers is None else [n - 1 for n in page_numbers]
+        texts = {i: _pdfium_page_text(pdf, i) for i in indices}
+    finally:
+        pdf.close()
+
+    # Reserv: låt pdfplumber försöka på sidor där pdfium inte hittade något
+    empty = [i for i, text in texts.items() if not text.strip()]
+    if empty and fallback:
+        try:
+            texts.update({i: t for i, t in _pdfplumber_texts(file_path, empty).items() if t.strip()})
+        except Exception:
+            pass
+
+    return {i + 1: text for i, text in texts.items()}
+
+
+def needs_ocr(text: str) -> bool:
+    """True om en sidas text är för kort för att sidan ska räknas som textbaserad."""
+    return len(text.strip()) <= MIN_TEXT_CHARS_PER_PAGE
+
+
+def page_runs(page_numbers) -> list[tuple[int, int]]:
+    """Sammanhängande intervall av sidnummer, t.ex. [1, 2, 3, 7] -> [(1, 3), (7, 7)]."""
+    runs = []
+    for n in sorted(page_numbers):
+        if runs and n == runs[-1][1] + 1:
+            runs[-1][1] = n
+        else:
+            runs.append([n, n])
+    return [(a, b) for a, b in runs]
+
+
+def format_page_ranges(page_numbers) -> str:
+    """Kompakt sidintervall, t.ex. [1, 2, 3, 7] -> "1-3,7"."""
+    return ",".join(str(a) if a == b else f"{a}-{b}" for a, b in page_runs(page_numbers))
+
+
+def parse_page_ranges(value: str) -> list[int]:
+    """Motsatsen till format_page_ranges: "1-3,7" -> [1, 2, 3, 7]."""
+    pages = []
+    for part in str(value).split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            a, b = part.split("-", 1)
+            pages.extend(range(int(a), int(b) + 1))
+        else:
+            pages.append(int(part))
+    return pages
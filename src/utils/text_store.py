@@ -0,0 +1,138 @@
+"""
+Kompakt lagring av extraherad text (alternativ till en JSON-fil per dokument).
+
+All text ligger i en SQLite-databas med en rad per sida, nycklad på samma
+dokument-id som JSON-filernas namn (hash av sökvägen + kort filnamn). Att läsa
+hela korpusen blir då en sekventiell genomläsning av en fil i stället för
+tiotusentals små json.load.
+
+Flera worker-processer kan skriva samtidigt (WAL-läge med väntetid vid lås).
+"""
+
+import json
+import sqlite3
+from pathlib import Path
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    doc_id      TEXT PRIMARY KEY,
+    filename    TEXT NOT NULL,
+    full_path   TEXT NOT NULL,
+    source      TEXT
+);
+CREATE TABLE IF NOT EXISTS pages (
+    doc_id      TEXT NOT NULL,
+    page_number INTEGER NOT NULL,
+    text        TEXT NOT NULL,
+    meta        TEXT,
+    PRIMARY KEY (doc_id, page_number)
+) WITHOUT ROWID;
+"""
+
+
+def _page_meta(page: dict) -> str | None:
+    """Övriga nycklar på en sida (t.ex. flik och radintervall för XLSX) som JSON."""
+    meta = {k: v for k, v in page.items() if k not in ("page_number", "text")}
+    return json.dumps(meta, ensure_ascii=False) if meta else None
+
+
+class TextStore:
+    """SQLite-lagring av extraherade dokument. Används som context manager."""
+
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.db_path, timeout=60)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def __len__(self):
+        return self._conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+
+    def doc_ids(self) -> set[str]:
+        return {row[0] for row in self._conn.execute("SELECT doc_id FROM documents")}
+
+    def put(self, doc_id: str, filename: str, full_path: str, pages: list, source: dict | None = None):
+        """
+        Sparar (eller ersätter) ett dokument med dess sidor i en transaktion.
+        source är källfilens fingeravtryck ({"size", "mtime_ns", "sha256"}).
+        """
+        with self._conn:
+            self._conn.execute("DELETE FROM pages WHERE doc_id = ?", (doc_id,))
+            self._conn.execute(
+                "INSERT OR REPLACE INTO documents (doc_id, filename, full_path, source) VALUES (?, ?, ?, ?)",
+                (doc_id, filename, full_path, json.dumps(source) if source else None),
+            )
+            self._conn.executemany(
+                "INSERT INTO pages (doc_id, page_number, text, meta) VALUES (?, ?, ?, ?)",
+                [(doc_id, p["page_number"], p["text"], _page_meta(p)) for p in pages],
+            )
+
+    def iter_documents(self):
+        """
+        Strömmar alla dokument i samma form som JSON-filerna:
+        {"doc_id", "filename", "full_path", "source", "pages": [{"page_number", "text", ...}, ...]}.
+        """
+        rows = self._conn.execute(
+            "SELECT d.doc_id, d.filename, d.full_path, d.source, p.page_number, p.text, p.meta "
+            "FROM documents d JOIN pages p ON p.doc_id = d.doc_id ORDER BY d.doc_id, p.page_number"
+        )
+        document = None
+        for doc_id, filename, full_path, source, page_number, text, meta in rows:
+            if document is None or document["doc_id"] != doc_id:
+                if document is not None:
+                    yield document
+                document = {
+                    "doc_id": doc_id, "filename": filename, "full_path": full_path,
+                    "source": json.loads(source) if source else None, "pages": [],
+                }
+            page = {"page_number": page_number, "text": text}
+            if meta:
+                page.update(json.loads(meta))
+            document["pages"].append(page)
+        if document is not None:
+            yield document
+
+    def checkpoint(self):
+        """Skriver tillbaka WAL-loggen till databasfilen, t.ex. innan filen kopieras eller zippas."""
+        self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def close(self):
+        self._conn.close()
+
+
+def iter_extracted_documents(json_dir: Path, store_path: Path | None = None, on_error=None):
+    """
+    Strömmar extraherade dokument från textlagringen (om den finns) och
+    därefter från JSON-filerna i json_dir som inte redan finns i lagringen.
+
+    on_error(file_path, exc) anropas för JSON-filer som inte går att läsa;
+    utan on_error kastas felet vidare.
+    """
+    seen = set()
+    if store_path is not None and Path(store_path).exists():
+        with TextStore(store_path) as store:
+            for document in store.iter_documents():
+                seen.add(document["doc_id"])
+                yield document
+
+    for file_path in Path(json_dir).rglob("*.json"):
+        if file_path.stem in seen:
+            continue
+        try:
+            with open(file_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            if on_error is None:
+                raise
+            on_error(file_path, e)
+            continue
+        data.setdefault("filename", file_path.name)
+        data["doc_id"] = file_path.stem
+        yield data
@@ -0,0 +1,105 @@
+"""
+Skrivning av embeddade batchar till vektordatabasen (steg 04).
+
+Chunks kommer i korpusordning, så en sidas chunks kan delas mellan två
+batchar. Den sista sidan i en batch registreras därför i
+inläsningsmanifestet först när nästa batch är skriven, och sidor med en
+misslyckad batch registreras inte förrän alla deras chunks är skrivna.
+Manifestet innehåller alltså bara sidor som finns helt i databasen, och en
+avbruten körning kan återupptas därifrån.
+
+En sida vars text har ändrats (utan att filen flaggats i steg 03) får nya
+chunk-ID:n, så dess gamla vektorer tas bort innan sidans första nya chunks
+skrivs.
+"""
+
+from pathlib import Path
+
+from src.utils.embedding_checkpoint import write_checkpoint
+from src.utils.ingest_manifest import IngestManifest
+
+
+def page_keys(chunks) -> list:
+    """Sidorna (full_path, sida, texthash) som chunkarna kommer från, i ordning och utan dubbletter."""
+    keys = (
+        (c.metadata['full_path'], c.metadata['page'], c.metadata['page_hash'])
+        for c in chunks
+    )
+    return list(dict.fromkeys(keys))
+
+
+class VectorWriter:
+    """
+    Gör upsert av batchar till en Chroma-samling och håller manifestet och
+    checkpointen i takt med det som faktiskt är skrivet. write_batch anropas
+    från en enda skrivartråd, i batchordning.
+    """
+
+    def __init__(self, collection, manifest: IngestManifest, checkpoint_path: Path, rebuild: bool = False):
+        self.collection = collection
+        self.manifest = manifest
+        self.checkpoint_path = checkpoint_path
+        self.rebuild = rebuild
+        self.pending_page = None
+        self.failed_pages = set()
+        self.failed_chunks = []  # (chunk, felmeddelande)
+        self.chunks_written = 0
+        self._cleared_pages = set()  # Sidor vars gamla vektorer redan tagits bort i körningen
+
+    def fail(self, batch, error: str):
+        """Registrerar en batch som inte gick att embedda; dess sidor hålls utanför manifestet."""
+        self.failed_pages.update(page_keys(batch))
+        self.failed_chunks.extend((chunk, error) for chunk in batch)
+
+    def _clear_replaced_pages(self, keys):
+        for full_path, page, page_hash in keys:
+            old_hash = self.manifest.stored_hash(full_path, page)
+            if old_hash is None or old_hash == page_hash or (full_path, page) in self._cleared_pages:
+                continue
+            self.collection.delete(where={'$and': [{'full_path': full_path}, {'page': page}]})
+            self._cleared_pages.add((full_path, page))
+
+    def write_batch(self, batch_number, batch, embeddings, retry: bool = False):
+        """Upsert med deterministiska ID:n, så att en omkörning är idempotent."""
+        keys = page_keys(batch)
+        try:
+            self._clear_replaced_pages(keys)
+            self.collection.upsert(
+                ids=[chunk.id for chunk in batch],
+                embeddings=embeddings,
+                documents=[chunk.page_content for chunk in batch],
+                metadatas=[chunk.metadata for chunk in batch],
+            )
+        except Exception as e:
+            self.fail(batch, str(e))
+            print(f"❌ Fel vid skrivning av batch {batch_number}: {e}")
+            return
+        self.chunks_written += len(batch)
+        if retry:
+            return
+
+        completed = keys[:-1]
+        if self.pending_page is not None and self.pending_page != keys[0]:
+            completed.insert(0, self.pending_page)
+        self.manifest.add(k for k in completed if k not in self.failed_pages)
+        self.pending_page = keys[-1]
+        write_checkpoint(self.checkpoint_path, batch_number, self.chunks_written, self.pending_page,
+                         rebuild=self.rebuild)
+
+    def take_failed_chunks(self) -> list:
+        """Tömmer listan med misslyckade chunks inför ett nytt försök (sidorna förblir oregistrerade)."""
+        chunks = [chunk for chunk, _ in self.failed_chunks]
+        self.failed_chunks.clear()
+        return chunks
+
+    def commit_retried_pages(self):
+        """Registrerar sidor vars alla chunks nu är skrivna efter ett nytt försök."""
+        still_failed = set(page_keys(chunk for chunk, _ in self.failed_chunks))
+        self.manifest.add(k for k in self.failed_pages if k not in still_failed)
+        self.failed_pages = still_failed
+
+    def finish(self):
+        """Registrerar den sista sidan när alla batchar är skrivna."""
+        if self.pending_page is not None and self.pending_page not in self.failed_pages:
+            self.manifest.add([self.pending_page])
+        self.pending_page = None
@@ -0,0 +1,140 @@
+"""
+Parallell, strömmande och rekursiv uppackning av ZIP-arkiv.
+
+Varje arkiv packas upp i en egen process bredvid sig självt. ZIP-filer som
+hittas inuti ett arkiv skickas direkt vidare till poolen, tills inga arkiv
+återstår. Varje fil strömmas från arkivet till sin slutliga plats (via en
+temporär fil i samma mapp som sedan byts in atomärt), och filer som redan
+finns på disk med samma storlek och CRC32 skrivs inte om.
+"""
+
+import os
+import zlib
+import shutil
+import zipfile
+from pathlib import Path
+from multiprocessing import cpu_count
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+COPY_BUFFER_SIZE = 1024 * 1024
+
+# Skydd mot "zip-bomber" med arkiv i arkiv i all oändlighet
+MAX_NESTING_DEPTH = 5
+
+
+def _file_crc32(path: Path) -> int:
+    crc = 0
+    with open(path, 'rb') as f:
+        while chunk := f.read(COPY_BUFFER_SIZE):
+            crc = zlib.crc32(chunk, crc)
+    return crc
+
+
+def _is_unchanged(target: Path, info: zipfile.ZipInfo) -> bool:
+    """True om target redan finns med samma storlek och CRC32 som arkivmedlemmen."""
+    try:
+        if target.stat().st_size != info.file_size:
+            return False
+        return _file_crc32(target) == info.CRC
+    except OSError:
+        return False
+
+
+def _member_target(extract_folder: Path, info: zipfile.ZipInfo) -> Path | None:
+    """Säker målsökväg för en arkivmedlem (inga absoluta sökvägar eller '..')."""
+    parts = [p for p in info.filename.replace('\\', '/').split('/') if p not in ('', '.', '..')]
+    if not parts:
+        return None
+    return extract_folder.joinpath(*parts)
+
+
+def _extract_member(zf: zipfile.ZipFile, info: zipfile.ZipInfo, target: Path):
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = target.with_name(f".{target.name}.{os.getpid()}.part")
+    try:
+        with zf.open(info) as src, open(tmp_path, 'wb') as dst:
+            shutil.copyfileobj(src, dst, COPY_BUFFER_SIZE)
+        os.replace(tmp_path, target)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+
+
+def extract_archive(zip_path: Path) -> dict:
+    """
+    Packar upp ett arkiv till dess egen mapp och raderar originalet.
+    Körs i en worker-process.
+
+    Returnerar en dict med status, antal uppackade/oförändrade filer och
+    sökvägarna till ZIP-filer som hittades i arkivet.
+    """
+    result = {"zip": zip_path, "status": "success", "extracted": 0, "skipped": 0, "nested": []}
+    extract_folder = zip_path.parent
+
+    try:
+        with zipfile.ZipFile(zip_path, 'r') as zf:
+            for info in zf.infolist():
+                target = _member_target(extract_folder, info)
+                if target is None or target == zip_path:
+                    continue
+                if info.is_dir():
+                    target.mkdir(parents=True, exist_ok=True)
+                    continue
+
+                if _is_unchanged(target, info):
+                    result["skipped"] += 1
+                else:
+                    _extract_member(zf, info, target)
+                    result["extracted"] += 1
+
+                if target.suffix.lower() == '.zip':
+                    result["nested"].append(target)
+
+        os.remove(zip_path)
+    except zipfile.BadZipFile:
+        result["status"] = "bad_zip"
+    except Exception as e:
+        result["status"] = f"error: {e}"
+    return result
+
+
+def extract_all_archives(zip_files: list[Path], max_workers: int | None = None) -> list[dict]:
+    """
+    Packar upp alla arkiv parallellt, inklusive arkiv som ligger i arkiven.
+    Returnerar resultatet för varje bearbetat arkiv.
+    """
+    max_workers = max_workers or cpu_count()
+    results = []
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        in_flight = {executor.submit(extract_archive, Path(z)): 0 for z in zip_files}
+
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                depth = in_flight.pop(future)
+                result = future.result()
+                results.append(result)
+                print(_format_result(result), flush=True)
+
+                for nested in result["nested"]:
+                    if depth + 1 > MAX_NESTING_DEPTH:
+                        print(f"  -> VARNING: {nested.name} ligger för djupt nästlad, packas inte upp.")
+                        continue
+                    in_flight[executor.submit(extract_archive, nested)] = depth + 1
+
+    return results
+
+
+def _format_result(result: dict) -> str:
+    name = result["zip"].name
+    if result["status"] == "bad_zip":
+        return f"  -> FEL: Kunde inte öppna {name}. Filen kan vara korrupt."
+    if result["status"] != "success":
+        return f"  -> FEL: {name}: {result['status']}"
+    line = f"  -> {name}: {result['extracted']} filer uppackade"
+    if result["skipped"]:
+        line += f", {result['skipped']} oförändrade hoppades över"
+    if result["nested"]:
+        line += f", {len(result['nested'])} inbäddade ZIP-filer"
+    return line
@@ -0,0 +1,23 @@
+import sys
+from pathlib import Path
+
+# Lägg till projektets rot i sys.path
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(PROJECT_ROOT))
+
+from src.utils.chunk_ids import chunk_id, text_hash
+
+
+def test_chunk_id_is_stable_and_distinguishes_inputs():
+    base = chunk_id("Skåne/beslut.pdf", 3, 0, "Länsstyrelsen beslutar")
+
+    assert base == chunk_id("Skåne/beslut.pdf", 3, 0, "Länsstyrelsen beslutar")
+    assert base.split(":")[1:3] == ["p3", "c0"]
+    assert base != chunk_id("Halland/beslut.pdf", 3, 0, "Länsstyrelsen beslutar")
+    assert base != chunk_id("Skåne/beslut.pdf", 4, 0, "Länsstyrelsen beslutar")
+    assert base != chunk_id("Skåne/beslut.pdf", 3, 1, "Länsstyrelsen beslutar")
+    assert base != chunk_id("Skåne/beslut.pdf", 3, 0, "Länsstyrelsen avslår")
+
+
+def test_text_hash_is_sha1_hex():
+    assert text_hash("") == "da39a3ee5e6b4b0d3255bfef95601890afd80709"
@@ -0,0 +1,89 @@
+import sys
+from pathlib import Path
+
+# Lägg till projektets rot i sys.path
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(PROJECT_ROOT))
+
+from src.utils.dedup import QUICK_HASH_BLOCK_SIZE, find_duplicates, get_file_hash
+
+
+def _write(path: Path, data: bytes) -> Path:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+    return path
+
+
+def _naive_duplicates(files):
+    """Referensimplementation: SHA256 på varje fil i tur och ordning."""
+    seen, duplicates = set(), []
+    for f in files:
+        h = get_file_hash(f)
+        if h in seen:
+            duplicates.append(f)
+        else:
+            seen.add(h)
+    return duplicates
+
+
+def test_find_duplicates_matches_naive_hashing(tmp_path):
+    big = b"a" * (3 * QUICK_HASH_BLOCK_SIZE)
+    # Samma början och slut, men olika i mitten -> krockar på snabbhash
+    big_variant = big[:QUICK_HASH_BLOCK_SIZE] + b"b" * QUICK_HASH_BLOCK_SIZE + big[-QUICK_HASH_BLOCK_SIZE:]
+
+    files = [
+        _write(tmp_path / "a" / "beslut.pdf", b"hej"),
+        _write(tmp_path / "b" / "unik.txt", b"unik storlek"),
+        _write(tmp_path / "b" / "beslut_kopia.pdf", b"hej"),
+        _write(tmp_path / "c" / "stor.pdf", big),
+        _write(tmp_path / "c" / "stor_variant.pdf", big_variant),
+        _write(tmp_path / "d" / "stor_kopia.pdf", big),
+        _write(tmp_path / "d" / "tom1.txt", b""),
+        _write(tmp_path / "d" / "tom2.txt", b""),
+        _write(tmp_path / "e" / "hej_igen.pdf", b"hej"),
+    ]
+
+    duplicates, unreadable = find_duplicates(files, max_workers=4)
+
+    assert unreadable == 0
+    assert duplicates == _naive_duplicates(files)
+    assert duplicates == [files[2], files[5], files[7], files[8]]
+
+
+def test_find_duplicates_skips_missing_files(tmp_path):
+    first = _write(tmp_path / "x.txt", b"data")
+    second = _write(tmp_path / "y.txt", b"data")
+    missing = tmp_path / "saknas.txt"
+
+    duplicates, unreadable = find_duplicates([missing, first, second])
+
+    assert duplicates == [second]
+    assert unreadable == 1
+
+
+def test_manifest_reuses_hashes_for_unchanged_files(tmp_path, monkeypatch):
+    from src.utils import dedup
+    from src.utils.file_manifest import FileManifest
+
+    raw = tmp_path / "raw"
+    files = [
+        _write(raw / "a.pdf", b"samma"),
+        _write(raw / "b.pdf", b"samma"),
+        _write(raw / "c.pdf", b"annan"),
+    ]
+    manifest_file = tmp_path / "manifest.sqlite"
+
+    with FileManifest(manifest_file, raw) as manifest:
+        first, _ = find_duplicates(files, manifest=manifest)
+
+    def _fail(*args):
+        raise AssertionError("Oförändrade filer ska inte hashas om")
+
+    monkeypatch.setattr(dedup, "get_file_hash", _fail)
+    monkeypatch.setattr(dedup, "get_quick_hash", _fail)
+
+    with FileManifest(manifest_file, raw) as manifest:
+        assert len(manifest) == 3
+        second, _ = find_duplicates(files, manifest=manifest)
+
+    assert first == second == [files[1]]
@@ -0,0 +1,42 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# Lägg till projektets rot i sys.path
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(PROJECT_ROOT))
+
+from src.utils.embedding_batching import embed_in_batches, plan_batches
+
+
+def test_length_strategy_keeps_padded_tokens_within_budget():
+    lengths = [500, 10, 12, 480, 11, 9, 300]
+
+    batches = plan_batches(lengths, "length", max_tokens=1000)
+
+    assert sorted(i for batch in batches for i in batch) == list(range(len(lengths)))
+    for batch in batches:
+        assert len(batch) * max(lengths[i] for i in batch) <= 1000
+    # De korta texterna hamnar tillsammans, inte med de långa
+    assert {1, 2, 4, 5} in [set(batch) for batch in batches]
+
+
+def test_fixed_strategy_keeps_corpus_order():
+    assert plan_batches([5] * 5, "fixed", batch_size=2) == [[0, 1], [2, 3], [4]]
+    with pytest.raises(ValueError):
+        plan_batches([5], "okänd")
+
+
+def test_embed_in_batches_restores_original_order():
+    texts = ["lång " * 50, "a", "mellan " * 10, "b"]
+    calls = []
+
+    def embed(batch):
+        calls.append(batch)
+        return [[len(text)] for text in batch]
+
+    embeddings = embed_in_batches(embed, texts, "length", max_tokens=32)
+
+    assert embeddings == [[len(text)] for text in texts]
+    assert calls[0] == ["a", "b"]
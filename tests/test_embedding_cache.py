@@ -0,0 +1,34 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+
+# Lägg till projektets rot i sys.path
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(PROJECT_ROOT))
+
+from src.utils.embedding_cache import EmbeddingCache
+
+
+def test_put_and_get_round_trip_across_instances(tmp_path):
+    with EmbeddingCache(tmp_path, "BAAI/bge-m3") as cache:
+        cache.put(["a", "b"], [[0.5, -0.25, 1.0], [0.1, 0.2, 0.3]])
+        cache.put(["b", "c", "c"], [[9.0, 9.0, 9.0], [1.0, 0.0, 0.0], [2.0, 0.0, 0.0]])
+        assert len(cache) == 3
+
+    with EmbeddingCache(tmp_path, "BAAI/bge-m3") as cache:
+        found = cache.get(["a", "b", "c", "saknas"])
+        assert cache.take_stats() == (3, 1)
+
+    assert set(found) == {"a", "b", "c"}
+    assert found["a"] == [0.5, -0.25, 1.0]
+    # Befintliga och dubblerade hashar skrivs inte över
+    np.testing.assert_allclose(found["b"], [0.1, 0.2, 0.3], rtol=1e-3)
+    assert found["c"] == [1.0, 0.0, 0.0]
+
+
+def test_models_have_separate_caches(tmp_path):
+    with EmbeddingCache(tmp_path, "BAAI/bge-m3") as cache:
+        cache.put(["a"], [[1.0, 2.0]])
+    with EmbeddingCache(tmp_path, "BAAI/bge-m3-onnx-int8") as cache:
+        assert cache.get(["a"]) == {}
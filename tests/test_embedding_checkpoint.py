@@ -0,0 +1,60 @@
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+# Lägg till projektets rot i sys.path
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(PROJECT_ROOT))
+
+from src.utils.embedding_checkpoint import (is_interrupted_rebuild, read_checkpoint, read_dead_letters,
+                                           write_checkpoint, write_dead_letters)
+from src.utils.ingest_manifest import IngestManifest
+
+
+def test_checkpoint_round_trip_and_overwrite(tmp_path):
+    path = tmp_path / "checkpoint.json"
+    assert read_checkpoint(path) is None
+
+    write_checkpoint(path, 3, 192, ("Skåne/beslut.pdf", 7))
+    write_checkpoint(path, 4, 256, None)
+
+    checkpoint = read_checkpoint(path)
+    assert (checkpoint["batch"], checkpoint["chunks_written"], checkpoint["full_path"]) == (4, 256, None)
+    assert list(tmp_path.iterdir()) == [path]
+
+
+def test_interrupted_full_rebuild_resumes_from_the_manifest(tmp_path):
+    checkpoint_path = tmp_path / "checkpoint.json"
+    manifest_path = tmp_path / "manifest.sqlite"
+
+    # Första körningen (full ombyggnad) skriver två batchar och kraschar sedan
+    manifest = IngestManifest(manifest_path)
+    manifest.add([("Skåne/beslut.pdf", 1, "aaa")])
+    write_checkpoint(checkpoint_path, 0, 64, ("Skåne/beslut.pdf", 2), rebuild=True)
+    manifest.add([("Skåne/beslut.pdf", 2, "bbb")])
+    write_checkpoint(checkpoint_path, 1, 128, ("Halland/beslut.pdf", 1), rebuild=True)
+    del manifest
+
+    # Omstarten ser att ombyggnaden avbröts och hoppar över det som redan är skrivet
+    assert is_interrupted_rebuild(read_checkpoint(checkpoint_path))
+    with IngestManifest(manifest_path) as manifest:
+        assert manifest.contains("Skåne/beslut.pdf", 1, "aaa")
+        assert manifest.contains("Skåne/beslut.pdf", 2, "bbb")
+        assert not manifest.contains("Halland/beslut.pdf", 1, "ccc")
+
+    # En inkrementell checkpoint, eller ingen alls, ger en ny ombyggnad från början
+    write_checkpoint(checkpoint_path, 5, 320, None)
+    assert not is_interrupted_rebuild(read_checkpoint(checkpoint_path))
+    assert not is_interrupted_rebuild(read_checkpoint(tmp_path / "saknas.json"))
+
+
+def test_dead_letters_round_trip(tmp_path):
+    path = tmp_path / "dead_letter.jsonl"
+    chunk = SimpleNamespace(id="abc:p2:c0:def", metadata={"full_path": "Skåne/beslut.pdf", "page": 2})
+
+    write_dead_letters(path, [(chunk, "MPS backend out of memory")])
+
+    assert read_dead_letters(path) == [
+        {"id": "abc:p2:c0:def", "full_path": "Skåne/beslut.pdf", "page": 2, "error": "MPS backend out of memory"}
+    ]
+    assert read_dead_letters(tmp_path / "saknas.jsonl") == []
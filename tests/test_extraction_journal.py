@@ -0,0 +1,63 @@
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Lägg till projektets rot i sys.path
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(PROJECT_ROOT))
+
+from src.utils.extraction_journal import ExtractionJournal
+
+
+def test_done_and_permanent_failures_are_skipped_after_reload(tmp_path):
+    journal_file = tmp_path / "journal.jsonl"
+    with ExtractionJournal(journal_file) as journal:
+        journal.record(Path("a.pdf"), "success", seconds=1.5, pages=3, engine="pdfium")
+        journal.record(Path("b.pdf"), "empty_or_error", seconds=0.2, pages=0, engine="tesseract")
+    with open(journal_file, "a", encoding="utf-8") as f:
+        f.write('{"full_path": "c.pdf", "sta')  # Avbruten skrivning
+
+    with ExtractionJournal(journal_file) as journal:
+        assert len(journal) == 2
+        assert journal.skip_reason(Path("a.pdf"), "pdfium") == "done"
+        assert journal.skip_reason(Path("b.pdf"), "tesseract") == "failed"
+        assert journal.skip_reason(Path("b.pdf"), "pdfium") is None
+        assert journal.skip_reason(Path("c.pdf"), "pdfium") is None
+
+
+def test_transient_failures_back_off_and_give_up(tmp_path):
+    with ExtractionJournal(tmp_path / "journal.jsonl", max_attempts=3, backoff_seconds=60) as journal:
+        journal.record(Path("a.pdf"), "timeout")
+        now = datetime.now()
+        assert journal.skip_reason(Path("a.pdf"), now=now) == "backoff"
+        assert journal.skip_reason(Path("a.pdf"), now=now + timedelta(seconds=61)) is None
+
+        journal.record(Path("a.pdf"), "error: trasig xref")
+        assert journal.skip_reason(Path("a.pdf"), now=now + timedelta(seconds=61)) == "backoff"
+        assert journal.skip_reason(Path("a.pdf"), now=now + timedelta(seconds=121)) is None
+
+        journal.record(Path("a.pdf"), "timeout")
+        assert journal.skip_reason(Path("a.pdf"), now=now + timedelta(days=1)) == "failed"
+
+
+def test_fingerprints_are_remembered_without_counting_as_attempts(tmp_path):
+    journal_file = tmp_path / "journal.jsonl"
+    old = {"size": 10, "mtime_ns": 1, "sha256": "aaa"}
+    new = {"size": 10, "mtime_ns": 2, "sha256": "aaa"}
+    with ExtractionJournal(journal_file) as journal:
+        journal.record(Path("a.pdf"), "success", pages=1, engine="pdfium", source=old)
+        journal.record_source(Path("a.pdf"), new)
+
+    with ExtractionJournal(journal_file) as journal:
+        assert journal.source(Path("a.pdf")) == new
+        assert journal.source(Path("b.pdf")) is None
+        assert journal.skip_reason(Path("a.pdf"), "pdfium") == "done"
+
+
+def test_partial_documents_run_again_when_the_engine_changes(tmp_path):
+    with ExtractionJournal(tmp_path / "journal.jsonl") as journal:
+        journal.record(Path("a.pdf"), "partial_no_ocr", pages=2, engine="pdfium+no-ocr")
+
+        assert journal.status(Path("a.pdf")) == "partial_no_ocr"
+        assert journal.skip_reason(Path("a.pdf"), "pdfium+no-ocr") == "partial"
+        assert journal.skip_reason(Path("a.pdf"), "pdfium+tesseract") is None
@@ -0,0 +1,51 @@
+import sys
+from pathlib import Path
+
+# Lägg till projektets rot i sys.path
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(PROJECT_ROOT))
+
+from src.utils.file_scan import NO_EXTENSION, scan_tree
+
+
+def test_scan_tree_builds_inventory(tmp_path):
+    (tmp_path / "a" / "b").mkdir(parents=True)
+    (tmp_path / "tom" / "inre").mkdir(parents=True)
+    (tmp_path / "a" / "beslut.PDF").write_bytes(b"12345")
+    (tmp_path / "a" / "b" / "arkiv.zip").write_bytes(b"zip")
+    (tmp_path / "a" / "b" / "README").write_bytes(b"")
+
+    inventory = scan_tree(tmp_path)
+
+    assert len(inventory.files) == 3
+    assert inventory.total_size == 8
+    assert inventory.extension_counts == {".pdf": 1, ".zip": 1, NO_EXTENSION: 1}
+    assert [e.path.name for e in inventory.zips] == ["arkiv.zip"]
+    assert inventory.empty_dirs == [tmp_path / "tom" / "inre"]
+
+
+def test_discard_updates_files_and_empty_dirs(tmp_path):
+    (tmp_path / "a").mkdir()
+    pdf = tmp_path / "a" / "beslut.pdf"
+    pdf.write_bytes(b"x")
+
+    inventory = scan_tree(tmp_path)
+    inventory.discard(pdf)
+
+    assert inventory.files == []
+    assert inventory.empty_dirs == [tmp_path / "a"]
+
+
+def test_scan_tree_lists_files_in_rglob_order(tmp_path):
+    # Ordningen avgör vilken dubblett som behålls, så den måste vara densamma som rglob
+    for region in ("blekinge", "skåne", "halland", "gotland"):
+        for sub in ("", "beslut", "beslut/bilagor", "samråd"):
+            folder = tmp_path / region / sub
+            folder.mkdir(parents=True, exist_ok=True)
+            (folder / "beslut.pdf").write_bytes(b"x")
+            (folder / f"{region}.txt").write_bytes(b"y")
+    (tmp_path / "rot.txt").write_bytes(b"z")
+
+    inventory = scan_tree(tmp_path)
+
+    assert [e.path for e in inventory.files] == [p for p in tmp_path.rglob("*") if p.is_file()]
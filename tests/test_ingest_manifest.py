@@ -0,0 +1,43 @@
+import sys
+from pathlib import Path
+
+# Lägg till projektets rot i sys.path
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(PROJECT_ROOT))
+
+from src.utils.ingest_manifest import IngestManifest
+
+
+def test_pages_are_keyed_on_full_path_and_text(tmp_path):
+    with IngestManifest(tmp_path / "manifest.sqlite") as manifest:
+        manifest.add([("Skåne/beslut.pdf", 1, "aaa"), ("Gammal/rapport.pdf", 1, None)])
+
+    with IngestManifest(tmp_path / "manifest.sqlite") as manifest:
+        assert len(manifest) == 2
+        assert manifest.contains("Skåne/beslut.pdf", 1, "aaa")
+        # Samma filnamn i en annan mapp är ett annat dokument
+        assert not manifest.contains("Halland/beslut.pdf", 1, "aaa")
+        assert not manifest.contains("Skåne/beslut.pdf", 1, "bbb")
+        assert not manifest.contains("Skåne/beslut.pdf", 2, "aaa")
+        # Okänd hash (inläst från en äldre databas) räknas som inläst
+        assert manifest.contains("Gammal/rapport.pdf", 1, "ccc")
+
+
+def test_remove_drops_all_pages_of_a_document(tmp_path):
+    with IngestManifest(tmp_path / "manifest.sqlite") as manifest:
+        manifest.add([("a.pdf", 1, "x"), ("a.pdf", 2, "y"), ("b.pdf", 1, "z")])
+        manifest.remove(["a.pdf"])
+        assert len(manifest) == 1
+
+    with IngestManifest(tmp_path / "manifest.sqlite") as manifest:
+        assert not manifest.contains("a.pdf", 2, "y")
+        assert manifest.contains("b.pdf", 1, "z")
+
+
+def test_stored_hash_tells_which_text_a_page_was_ingested_with(tmp_path):
+    with IngestManifest(tmp_path / "manifest.sqlite") as manifest:
+        manifest.add([("a.pdf", 1, "x"), ("Gammal/rapport.pdf", 1, None)])
+
+        assert manifest.stored_hash("a.pdf", 1) == "x"
+        assert manifest.stored_hash("a.pdf", 2) is None
+        assert manifest.stored_hash("Gammal/rapport.pdf", 1) is None
@@ -0,0 +1,30 @@
+import sys
+from pathlib import Path
+
+# Lägg till projektets rot i sys.path
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(PROJECT_ROOT))
+
+from src.utils.ocr_cache import OcrCache, cache_key
+
+
+def test_cache_key_depends_on_image_and_params():
+    key = cache_key(b"pixels", "swe", 200)
+
+    assert key == cache_key(b"pixels", "swe", 200)
+    assert key != cache_key(b"pixels", "swe", 300)
+    assert key != cache_key(b"pixels", "eng", 200)
+    assert key != cache_key(b"andra pixels", "swe", 200)
+
+
+def test_get_put_and_stats(tmp_path):
+    cache = OcrCache(tmp_path / "ocr_cache")
+    key = cache_key(b"pixels", "swe", 200)
+
+    assert cache.get(key) is None
+    cache.put(key, "Beslut om tillstånd")
+    assert OcrCache(tmp_path / "ocr_cache").get(key) == "Beslut om tillstånd"
+    assert cache.get(key) == "Beslut om tillstånd"
+
+    assert cache.take_stats() == (1, 1)
+    assert cache.take_stats() == (0, 0)
@@ -0,0 +1,38 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+# Lägg till projektets rot i sys.path
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(PROJECT_ROOT))
+
+pytest.importorskip("onnxruntime")
+pytest.importorskip("langchain_huggingface")
+
+from src.utils.paths import ONNX_MODEL_DIR
+from src.utils.embedding_backends import ONNX_MODEL_FILE, OnnxEmbeddings, load_embeddings
+
+TEXTS = [
+    "Länsstyrelsen beslutar att lämna tillstånd till vindkraftsparken.",
+    "Miljöprövningsdelegationen avslår ansökan om tre vindkraftverk.",
+    "Tabell 3 | Ljudnivå dB(A) | 40 | 38",
+    "Samrådsredogörelse för etablering av en solcellspark i Skåne län, med synpunkter från "
+    "kommunen, närboende och Trafikverket om anslutningsvägar och påverkan på landskapsbilden.",
+]
+
+
+@pytest.mark.skipif(not (ONNX_MODEL_DIR / ONNX_MODEL_FILE).exists(),
+                    reason="ONNX-modellen är inte exporterad (kör load_embeddings('onnx') först)")
+def test_onnx_int8_matches_fp32_embeddings():
+    reference = np.asarray(load_embeddings("torch", device="cpu").embed_documents(TEXTS))
+    onnx_model = OnnxEmbeddings(ONNX_MODEL_DIR)
+    documents = np.asarray(onnx_model.embed_documents(TEXTS))
+    query = np.asarray(onnx_model.embed_query(TEXTS[0]))
+
+    cosine = (reference * documents).sum(axis=1) / (
+        np.linalg.norm(reference, axis=1) * np.linalg.norm(documents, axis=1)
+    )
+    assert cosine.min() >= 0.99
+    assert np.allclose(query, documents[0], atol=1e-4)
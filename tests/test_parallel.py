@@ -0,0 +1,114 @@
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+
+# Lägg till projektets rot i sys.path
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(PROJECT_ROOT))
+
+from src.utils.parallel import BackgroundWriter, TaskTimeout, ordered_map, recycling_map
+
+
+def test_recycling_map_returns_every_result():
+    items = list(range(-10, 10))
+
+    results = {item: future.result() for item, future in recycling_map(abs, items, max_workers=2, max_tasks_per_child=3)}
+
+    assert results == {i: abs(i) for i in items}
+
+
+def test_recycling_map_restarts_pool_over_rss_limit():
+    # En RSS-gräns på 1 MB överskrids alltid, så poolen startas om efter varje omgång
+    results = [future.result() for _, future in recycling_map(abs, range(-5, 0), max_workers=2, max_rss_mb=1)]
+
+    assert sorted(results) == [1, 2, 3, 4, 5]
+
+
+def test_recycling_map_passes_exceptions_through():
+    (item, future), = recycling_map(abs, ["x"], max_workers=1)
+
+    assert item == "x"
+    assert isinstance(future.exception(), TypeError)
+
+
+def test_recycling_map_times_out_hung_tasks_and_requeues_the_rest():
+    items = [0.0, 30.0, 0.1, 0.2, 0.3]
+
+    results = dict(recycling_map(time.sleep, items, max_workers=2,
+                                 timeout_for=lambda seconds: 2, poll_seconds=0.1))
+
+    assert isinstance(results[30.0].exception(), TaskTimeout)
+    assert all(results[s].result() is None for s in items if s != 30.0)
+
+
+def test_recycling_map_budget_starts_when_a_worker_picks_up_the_task():
+    # De korta uppgifterna står i kö bakom de långa längre än sin egen budget,
+    # men ska inte räknas som timeout förrän de faktiskt körs
+    items = [2.0, 2.5, 0.1, 0.11, 0.12]
+
+    start = time.monotonic()
+    results = dict(recycling_map(time.sleep, items, max_workers=2,
+                                 timeout_for=lambda seconds: 5 if seconds > 1 else 0.5, poll_seconds=0.05))
+    elapsed = time.monotonic() - start
+
+    assert all(results[s].result() is None for s in items)
+    # Ingen omstart av de långa uppgifterna
+    assert elapsed < 4.5
+
+
+def record_and_sleep(task):
+    log_path, seconds = task
+    with open(log_path, "a", encoding="utf-8") as f:
+        f.write(f"{seconds}\n")
+    time.sleep(seconds)
+
+
+def test_recycling_map_lets_started_tasks_finish_before_killing_a_hung_one(tmp_path):
+    # 30 s hänger sig; 2.0 och 2.5 körs samtidigt och ska inte startas om
+    log_path = tmp_path / "executions.log"
+    items = [(log_path, s) for s in (30.0, 2.0, 2.5, 0.1, 0.11, 0.12, 0.13)]
+
+    results = dict(recycling_map(record_and_sleep, items, max_workers=3,
+                                 timeout_for=lambda task: 1 if task[1] > 10 else 5, poll_seconds=0.05))
+
+    assert isinstance(results[items[0]].exception(), TaskTimeout)
+    assert all(results[task].result() is None for task in items[1:])
+    executions = log_path.read_text(encoding="utf-8").split()
+    assert sorted(executions) == sorted(str(s) for _, s in items)
+
+
+def test_ordered_map_keeps_input_order():
+    def slow_abs(item):
+        time.sleep(0.01 * item)
+        return abs(item)
+
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        results = [(item, future.result()) for item, future in ordered_map(executor, slow_abs, [5, 1, 3, 0, 2], 3)]
+
+    assert results == [(5, 5), (1, 1), (3, 3), (0, 0), (2, 2)]
+
+
+def test_background_writer_writes_in_order_and_reports_errors():
+    written = []
+
+    def write(batch):
+        if batch == "fel":
+            raise ValueError(batch)
+        time.sleep(0.01)
+        written.append(batch)
+
+    with BackgroundWriter(write, max_queued=1) as writer:
+        for batch in range(5):
+            writer.submit(batch)
+        writer.flush()
+        assert written == [0, 1, 2, 3, 4]
+        writer.submit(5)
+    assert written == [0, 1, 2, 3, 4, 5]
+
+    writer = BackgroundWriter(write)
+    writer.submit("fel")
+    with pytest.raises(ValueError):
+        writer.close()
@@ -0,0 +1,93 @@
+import importlib.util
+import sys
+from concurrent.futures import Future
+from pathlib import Path
+
+import pandas as pd
+
+# Lägg till projektets rot och src i sys.path (steget importerar utils direkt)
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(PROJECT_ROOT))
+sys.path.append(str(PROJECT_ROOT / "src"))
+
+# Stegets filnamn börjar med en siffra och kan inte importeras med import-satsen
+_spec = importlib.util.spec_from_file_location("pdf_ocr_analysis", PROJECT_ROOT / "src" / "02_pdf_ocr_analysis.py")
+pdf_ocr_analysis = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(pdf_ocr_analysis)
+
+
+def report_row(name: str, size, mtime_ns) -> dict:
+    return {
+        "full_path": f"Skåne/{name}", "status": "text_based", "chars_page_1": 120, "total_pages": 3,
+        "filename": name, "ocr_pages": "", "source_size": size, "source_mtime_ns": mtime_ns,
+    }
+
+
+def test_report_keeps_exact_fingerprints_when_a_row_lacks_one(tmp_path):
+    report = tmp_path / "report.csv"
+    pd.DataFrame(columns=pdf_ocr_analysis.REPORT_COLUMNS).to_csv(report, index=False)
+    mtime_ns = 1729123456789012345
+
+    pdf_ocr_analysis.append_to_report([
+        report_row("a.pdf", 1024, mtime_ns),
+        report_row("b.pdf", None, None),
+    ], report)
+
+    df = pd.read_csv(report, dtype=pdf_ocr_analysis.FINGERPRINT_DTYPES)
+    assert df.loc[0, "source_size"] == 1024
+    assert df.loc[0, "source_mtime_ns"] == mtime_ns
+    assert pd.isna(df.loc[1, "source_mtime_ns"])
+
+
+def sequential_map(func, items, **kwargs):
+    """Ersätter recycling_map i testet: kör uppgifterna i tur och ordning i samma process."""
+    for item in items:
+        future = Future()
+        try:
+            future.set_result(func(item))
+        except Exception as e:
+            future.set_exception(e)
+        yield item, future
+
+
+def test_worker_errors_are_analysed_again_but_file_errors_are_kept(tmp_path, monkeypatch):
+    raw_dir, report = tmp_path / "raw", tmp_path / "report.csv"
+    raw_dir.mkdir()
+    for name in ("worker.pdf", "legacy.pdf", "broken.pdf"):
+        (raw_dir / name).write_bytes(b"%PDF-1.4")
+    stats = {name: pdf_ocr_analysis.file_stat(raw_dir / name) for name in ("worker.pdf", "broken.pdf")}
+    pd.DataFrame(columns=pdf_ocr_analysis.REPORT_COLUMNS).to_csv(report, index=False)
+    rows = [
+        {**report_row("worker.pdf", *stats["worker.pdf"]), "status": "error_worker_BrokenProcessPool"},
+        {**report_row("legacy.pdf", None, None), "status": "error_BrokenProcessPool"},
+        {**report_row("broken.pdf", *stats["broken.pdf"]), "status": "error_PdfiumError"},
+    ]
+    pdf_ocr_analysis.append_to_report([{**r, "full_path": str(raw_dir / r["filename"])} for r in rows], report)
+
+    analysed = []
+    monkeypatch.setattr(pdf_ocr_analysis, "RAW_DATA_DIR", raw_dir)
+    monkeypatch.setattr(pdf_ocr_analysis, "ANALYSIS_REPORT_FILE", report)
+    monkeypatch.setattr(pdf_ocr_analysis, "ensure_directories", lambda: None)
+    monkeypatch.setattr(pdf_ocr_analysis, "recycling_map", sequential_map)
+    monkeypatch.setattr(pdf_ocr_analysis, "analyze_pdf_type", lambda path: analysed.append(path.name) or {
+        "status": "text_based", "chars_page_1": 120, "total_pages": 1, "ocr_pages": "",
+    })
+
+    pdf_ocr_analysis.main()
+
+    assert sorted(analysed) == ["legacy.pdf", "worker.pdf"]
+    df = pd.read_csv(report, dtype=pdf_ocr_analysis.FINGERPRINT_DTYPES).set_index("filename")
+    assert df.loc["broken.pdf", "status"] == "error_PdfiumError"
+    assert df.loc["worker.pdf", "status"] == "text_based"
+
+
+def test_pages_only_pdfplumber_can_read_are_not_sent_to_ocr(monkeypatch):
+    def fake_extract(path, engine, page_numbers=None, fallback=True):
+        # Sida 2 har ett textlager som pdfium inte hittar men reserven gör
+        return {1: "x" * 200, 2: "y" * 200 if fallback else ""}
+
+    monkeypatch.setattr(pdf_ocr_analysis, "extract_page_texts", fake_extract)
+
+    result = pdf_ocr_analysis.analyze_pdf_type(Path("rapport.pdf"))
+
+    assert (result["status"], result["ocr_pages"]) == ("text_based", "")
@@ -0,0 +1,23 @@
+import sys
+from pathlib import Path
+
+# Lägg till projektets rot i sys.path
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(PROJECT_ROOT))
+
+from src.utils.pdf_text import format_page_ranges, needs_ocr, page_runs, parse_page_ranges
+
+
+def test_page_ranges_round_trip():
+    pages = [9, 2, 3, 4, 5, 12, 13]
+
+    assert page_runs(pages) == [(2, 5), (9, 9), (12, 13)]
+    assert format_page_ranges(pages) == "2-5,9,12-13"
+    assert parse_page_ranges("2-5,9,12-13") == [2, 3, 4, 5, 9, 12, 13]
+    assert parse_page_ranges("") == []
+
+
+def test_needs_ocr_uses_character_threshold():
+    assert needs_ocr("   \n")
+    assert needs_ocr("x" * 50)
+    assert not needs_ocr("x" * 51)
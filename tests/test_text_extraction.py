@@ -0,0 +1,180 @@
+import importlib.util
+import json
+import sys
+from concurrent.futures import Future
+from pathlib import Path
+from types import SimpleNamespace
+
+# Lägg till projektets rot och src i sys.path (steget importerar utils direkt)
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(PROJECT_ROOT))
+sys.path.append(str(PROJECT_ROOT / "src"))
+
+# Stegets filnamn börjar med en siffra och kan inte importeras med import-satsen
+_spec = importlib.util.spec_from_file_location("text_extraction", PROJECT_ROOT / "src" / "03_text_extraction.py")
+text_extraction = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(text_extraction)
+
+from src.utils.ocr_cache import OcrCache
+
+
+class FakeImage:
+    """Det pytesseract och OCR-cachen behöver av en PIL-bild."""
+
+    def __init__(self, page_number: int):
+        self.page_number = page_number
+        self.mode, self.size = "L", (1, 1)
+
+    def tobytes(self) -> bytes:
+        return str(self.page_number).encode()
+
+    def close(self):
+        pass
+
+
+def fake_ocr(monkeypatch, tmp_path) -> list:
+    """Ersätter pdf2image och Tesseract; returnerar listan med begärda sidintervall."""
+    rendered = []
+
+    def convert_from_path(path, poppler_path, dpi, first_page, last_page):
+        rendered.append((first_page, last_page))
+        return [FakeImage(n) for n in range(first_page, last_page + 1)]
+
+    monkeypatch.setattr(text_extraction, "OCR_ENABLED", True)
+    monkeypatch.setattr(text_extraction, "POPPLER_PATH", None, raising=False)
+    monkeypatch.setattr(text_extraction, "convert_from_path", convert_from_path, raising=False)
+    monkeypatch.setattr(text_extraction, "pytesseract", SimpleNamespace(
+        image_to_string=lambda img, lang: f"OCR-text sida {img.page_number}"), raising=False)
+    monkeypatch.setattr(text_extraction, "OCR_CACHE", OcrCache(tmp_path / "ocr_cache"))
+    return rendered
+
+
+def part_future(result=None, error=None) -> Future:
+    future = Future()
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
+    return future
+
+
+def test_save_json_never_leaves_a_partial_document(tmp_path, monkeypatch):
+    raw_dir, out_dir = tmp_path / "raw", tmp_path / "out"
+    out_dir.mkdir()
+    source = raw_dir / "Skåne" / "beslut.pdf"
+    pages = [{"page_number": 1, "text": "Länsstyrelsen beslutar"}]
+
+    def dump_then_die(data, f, **kwargs):
+        f.write('{"filename": "besl')
+        raise KeyboardInterrupt  # Som när workern dödas mitt i skrivningen
+
+    monkeypatch.setattr(text_extraction.json, "dump", dump_then_die)
+    try:
+        text_extraction.save_json(source, pages, out_dir, raw_dir)
+    except KeyboardInterrupt:
+        pass
+    assert list(out_dir.glob("*.json")) == []
+
+    monkeypatch.undo()
+    assert text_extraction.save_json(source, pages, out_dir, raw_dir) == "success"
+    (saved,) = out_dir.glob("*.json")
+    assert json.loads(saved.read_text(encoding="utf-8"))["full_path"] == str(Path("Skåne") / "beslut.pdf")
+
+
+def test_mixed_pdf_without_ocr_is_saved_as_partial(tmp_path, monkeypatch):
+    pdf = tmp_path / "blandad.pdf"
+    pdf.write_bytes(b"%PDF-1.4")
+    monkeypatch.setattr(text_extraction, "OCR_ENABLED", False)
+    monkeypatch.setattr(text_extraction, "extract_text_from_mixed_pdf",
+                        lambda path, total, ocr: [{"page_number": 1, "text": "Textsida"}])
+    monkeypatch.setattr(text_extraction, "save_document", lambda path, pages, source: "success")
+
+    _, status, pages, _ = text_extraction.extract_single_file((pdf, "mixed", "pdf", (3, [2, 3])))
+
+    assert (status, pages) == ("partial_no_ocr", 1)
+
+
+def test_xlsx_is_split_into_pages_with_sheet_and_row_metadata(tmp_path, monkeypatch):
+    import openpyxl
+
+    monkeypatch.setattr(text_extraction, "XLSX_ROWS_PER_PAGE", 3)
+    workbook = openpyxl.Workbook()
+    ws = workbook.active
+    ws.title = "Beslut"
+    ws.append(["Diarienr", "Län", "Belopp"])
+    ws.append(["551-123", "Skåne", 1500.0])
+    ws.append([])  # Tomma rader hoppas över
+    ws.append(["551-124", "Halland", None])
+    ws.append(["551-125", None, 2.5])
+    workbook.create_sheet("Tom")
+    workbook.save(tmp_path / "beslut.xlsx")
+
+    pages = text_extraction.extract_text_from_xlsx(tmp_path / "beslut.xlsx")
+
+    assert [(p["page_number"], p["sheet"], p["rows"]) for p in pages] == [(1, "Beslut", "1-4"), (2, "Beslut", "5-5")]
+    assert pages[0]["text"] == (
+        "--- Flik: Beslut (rad 1-4) ---\n"
+        "Diarienr | Län | Belopp\n"
+        "551-123 | Skåne | 1500\n"
+        "551-124 | Halland"
+    )
+    assert pages[1]["text"] == "--- Flik: Beslut (rad 5-5) ---\n551-125 |  | 2.5"
+
+
+def test_ocr_renders_pages_in_windows(tmp_path, monkeypatch):
+    rendered = fake_ocr(monkeypatch, tmp_path)
+    monkeypatch.setattr(text_extraction, "OCR_PAGE_WINDOW", 4)
+
+    pages = text_extraction.extract_text_from_ocr_pdf(tmp_path / "skannad.pdf", [1, 2, 3, 5, 6, 7, 8, 9, 10])
+
+    assert rendered == [(1, 3), (5, 8), (9, 10)]
+    assert [p["page_number"] for p in pages] == [1, 2, 3, 5, 6, 7, 8, 9, 10]
+    assert pages[0]["text"] == "OCR-text sida 1"
+
+
+def test_split_pdf_parts_are_assembled_in_page_order(tmp_path, monkeypatch):
+    fake_ocr(monkeypatch, tmp_path)
+    monkeypatch.setattr(text_extraction, "OCR_PAGES_PER_TASK", 10)
+    monkeypatch.setattr(text_extraction, "extract_text_from_text_pdf",
+                        lambda path, page_numbers: [{"page_number": n, "text": f"Text {n}"} for n in page_numbers])
+    saved = []
+    monkeypatch.setattr(text_extraction, "save_document", lambda path, pages, source: saved.append(pages) or "success")
+    pdf = tmp_path / "blandad.pdf"
+    pdf.write_bytes(b"%PDF-1.4")
+    ocr_pages = list(range(3, 26))
+
+    parts = text_extraction.split_pdf_task(pdf, 26, ocr_pages)
+
+    assert [(text, ocr[0], ocr[-1]) for _, text, ocr in parts] == [([1, 2, 26], 3, 12), ([], 13, 22), ([], 23, 25)]
+
+    assembly = {"status": "success_mixed", "engine": "pdfium+tesseract", "remaining": len(parts),
+                "pages": [], "error": None, "seconds": 0.0}
+    # Delarna blir klara i omvänd ordning
+    for part in reversed(parts):
+        text_extraction.collect_pdf_part(assembly, part_future((text_extraction.process_pdf_part(part), 1.0)))
+    assert assembly["remaining"] == 0
+
+    _, status, page_count, _ = text_extraction.finish_split_pdf(pdf, assembly)
+
+    assert (status, page_count) == ("success_mixed", 26)
+    assert [p["page_number"] for p in saved[0]] == list(range(1, 27))
+
+
+def test_split_pdf_with_a_failed_part_is_not_saved_with_gaps(tmp_path, monkeypatch):
+    saved = []
+    monkeypatch.setattr(text_extraction, "save_document", lambda path, pages, source: saved.append(pages) or "success")
+    pdf = tmp_path / "skannad.pdf"
+    pdf.write_bytes(b"%PDF-1.4")
+
+    for error, expected in ((text_extraction.TaskTimeout("överskred 720 s"), "timeout"),
+                            (RuntimeError("poppler kraschade"), "error: poppler kraschade")):
+        assembly = {"status": "success_ocr", "engine": "tesseract", "remaining": 2,
+                    "pages": [], "error": None, "seconds": 0.0}
+        first = [{"page_number": n, "text": f"OCR {n}"} for n in range(1, 11)]
+        text_extraction.collect_pdf_part(assembly, part_future(((first, (0, 10)), 1.0)))
+        text_extraction.collect_pdf_part(assembly, part_future(error=error))
+
+        _, status, page_count, _ = text_extraction.finish_split_pdf(pdf, assembly)
+
+        assert (status, page_count) == (expected, 0)
+    assert saved == []
@@ -0,0 +1,53 @@
+import json
+import sys
+from pathlib import Path
+
+# Lägg till projektets rot i sys.path
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(PROJECT_ROOT))
+
+from src.utils.text_store import TextStore, iter_extracted_documents
+
+
+def test_put_replaces_and_streams_documents_in_order(tmp_path):
+    with TextStore(tmp_path / "text.sqlite") as store:
+        store.put("b_doc", "b.pdf", "x/b.pdf", [{"page_number": 2, "text": "två"}, {"page_number": 1, "text": "ett"}])
+        store.put("a_doc", "a.txt", "a.txt", [{"page_number": 1, "text": "gammal"}])
+        store.put("a_doc", "a.txt", "a.txt", [{"page_number": 1, "text": "ny"}],
+                  source={"size": 2, "mtime_ns": 5, "sha256": "abc"})
+
+        assert len(store) == 2
+        assert store.doc_ids() == {"a_doc", "b_doc"}
+        documents = list(store.iter_documents())
+
+    assert [d["doc_id"] for d in documents] == ["a_doc", "b_doc"]
+    assert documents[0]["pages"] == [{"page_number": 1, "text": "ny"}]
+    assert documents[0]["source"] == {"size": 2, "mtime_ns": 5, "sha256": "abc"}
+    assert documents[1]["source"] is None
+    assert [p["page_number"] for p in documents[1]["pages"]] == [1, 2]
+
+
+def test_iter_extracted_documents_merges_store_and_json(tmp_path):
+    json_dir = tmp_path / "extracted_text"
+    json_dir.mkdir()
+    for doc_id in ("a_doc", "c_doc"):
+        (json_dir / f"{doc_id}.json").write_text(
+            json.dumps({"filename": doc_id, "full_path": doc_id, "pages": [{"page_number": 1, "text": "json"}]}),
+            encoding="utf-8",
+        )
+    with TextStore(tmp_path / "text.sqlite") as store:
+        store.put("a_doc", "a_doc", "a_doc", [{"page_number": 1, "text": "sqlite"}])
+
+    documents = {d["doc_id"]: d for d in iter_extracted_documents(json_dir, tmp_path / "text.sqlite")}
+
+    assert documents["a_doc"]["pages"][0]["text"] == "sqlite"
+    assert documents["c_doc"]["pages"][0]["text"] == "json"
+
+
+def test_extra_page_keys_round_trip(tmp_path):
+    page = {"page_number": 1, "text": "a | b", "sheet": "Blad1", "rows": "1-500"}
+    with TextStore(tmp_path / "text.sqlite") as store:
+        store.put("x_doc", "x.xlsx", "x.xlsx", [page])
+        (document,) = store.iter_documents()
+
+    assert document["pages"] == [page]
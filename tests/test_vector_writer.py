@@ -0,0 +1,99 @@
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+# Lägg till projektets rot i sys.path
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(PROJECT_ROOT))
+
+from src.utils.embedding_checkpoint import read_checkpoint
+from src.utils.ingest_manifest import IngestManifest
+from src.utils.parallel import BackgroundWriter
+from src.utils.vector_writer import VectorWriter
+
+
+class FakeCollection:
+    """Chroma-samling i minnet vars upsert misslyckas för valda batchar (räknat från 1)."""
+
+    def __init__(self, failing_upserts=()):
+        self.failing_upserts = set(failing_upserts)
+        self.upserts = 0
+        self.ids = set()
+        self.deleted = []
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        self.upserts += 1
+        if self.upserts in self.failing_upserts:
+            raise RuntimeError("database is locked")
+        self.ids.update(ids)
+
+    def delete(self, where):
+        self.deleted.append(where)
+
+
+def chunk(full_path: str, page: int, index: int, page_hash: str = "h"):
+    return SimpleNamespace(
+        id=f"{full_path}:{page}:{index}", page_content=f"text {index}",
+        metadata={"full_path": full_path, "page": page, "page_hash": page_hash},
+    )
+
+
+def write_all(writer: VectorWriter, batches):
+    # Som i steg 04: en skrivartråd i batchordning
+    with BackgroundWriter(writer.write_batch) as background:
+        for number, batch in enumerate(batches):
+            background.submit(number, batch, [[0.0]] * len(batch))
+    writer.finish()
+
+
+def test_only_pages_of_written_batches_are_committed(tmp_path):
+    # a.pdf s1 ryms i batch 1; a.pdf s2 delas mellan batch 1 och 2; b.pdf s1 ligger i batch 2
+    batches = [
+        [chunk("a.pdf", 1, 0), chunk("a.pdf", 1, 1), chunk("a.pdf", 2, 0)],
+        [chunk("a.pdf", 2, 1), chunk("b.pdf", 1, 0)],
+    ]
+    collection = FakeCollection(failing_upserts={2})
+
+    with IngestManifest(tmp_path / "manifest.sqlite") as manifest:
+        writer = VectorWriter(collection, manifest, tmp_path / "checkpoint.json")
+        write_all(writer, batches)
+
+        assert manifest.contains("a.pdf", 1, "h")
+        assert not manifest.contains("a.pdf", 2, "h")
+        assert not manifest.contains("b.pdf", 1, "h")
+    assert [c.id for c, _ in writer.failed_chunks] == ["a.pdf:2:1", "b.pdf:1:0"]
+    assert read_checkpoint(tmp_path / "checkpoint.json")["batch"] == 0
+
+
+def test_retried_pages_are_committed_once_all_their_chunks_are_written(tmp_path):
+    batches = [
+        [chunk("a.pdf", 1, 0), chunk("a.pdf", 2, 0)],
+        [chunk("a.pdf", 2, 1), chunk("b.pdf", 1, 0)],
+        [chunk("c.pdf", 1, 0)],
+    ]
+    collection = FakeCollection(failing_upserts={2})
+
+    with IngestManifest(tmp_path / "manifest.sqlite") as manifest:
+        writer = VectorWriter(collection, manifest, tmp_path / "checkpoint.json")
+        write_all(writer, batches)
+        assert len(manifest) == 2  # a.pdf s1 och c.pdf s1
+
+        retry = writer.take_failed_chunks()
+        writer.write_batch("omförsök 0", retry, [[0.0]] * len(retry), retry=True)
+        writer.commit_retried_pages()
+
+        assert all(manifest.contains(p, n, "h") for p, n in [("a.pdf", 1), ("a.pdf", 2), ("b.pdf", 1), ("c.pdf", 1)])
+    assert writer.failed_chunks == []
+
+
+def test_changed_pages_lose_their_old_vectors_once(tmp_path):
+    batches = [[chunk("a.pdf", 1, 0, "ny")], [chunk("a.pdf", 1, 1, "ny"), chunk("b.pdf", 1, 0)]]
+    collection = FakeCollection()
+
+    with IngestManifest(tmp_path / "manifest.sqlite") as manifest:
+        manifest.add([("a.pdf", 1, "gammal"), ("b.pdf", 1, None)])
+        writer = VectorWriter(collection, manifest, tmp_path / "checkpoint.json")
+        write_all(writer, batches)
+
+        assert collection.deleted == [{"$and": [{"full_path": "a.pdf"}, {"page": 1}]}]
+        assert manifest.contains("a.pdf", 1, "ny")
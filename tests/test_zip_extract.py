@@ -0,0 +1,46 @@
+import io
+import sys
+import zipfile
+from pathlib import Path
+
+# Lägg till projektets rot i sys.path
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(PROJECT_ROOT))
+
+from src.utils.zip_extract import extract_all_archives, extract_archive
+
+
+def _zip_bytes(members: dict) -> bytes:
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, 'w', zipfile.ZIP_DEFLATED) as zf:
+        for name, data in members.items():
+            zf.writestr(name, data)
+    return buf.getvalue()
+
+
+def test_extracts_nested_archives(tmp_path):
+    inner = _zip_bytes({"bilagor/bilaga.txt": "bilaga"})
+    outer = tmp_path / "leverans.zip"
+    outer.write_bytes(_zip_bytes({"beslut.pdf": "pdf", "bilagor.zip": inner, "../utanför.txt": "x"}))
+
+    results = extract_all_archives([outer], max_workers=2)
+
+    assert [r["status"] for r in results] == ["success", "success"]
+    assert (tmp_path / "beslut.pdf").read_text() == "pdf"
+    assert (tmp_path / "bilagor" / "bilaga.txt").read_text() == "bilaga"
+    assert (tmp_path / "utanför.txt").exists()
+    assert not outer.exists()
+    assert not (tmp_path / "bilagor.zip").exists()
+
+
+def test_skips_members_already_on_disk(tmp_path):
+    archive = tmp_path / "a.zip"
+    payload = _zip_bytes({"samma.txt": "samma", "ny.txt": "ny version"})
+    (tmp_path / "samma.txt").write_text("samma")
+    (tmp_path / "ny.txt").write_text("gammal")
+    archive.write_bytes(payload)
+
+    result = extract_archive(archive)
+
+    assert (result["extracted"], result["skipped"]) == (1, 1)
+    assert (tmp_path / "ny.txt").read_text() == "ny version"